@@ -1,6 +1,6 @@
 import streamlit as st
 from mitra import process_files, __description__
-from args import Setup
+from args import Session, parseArgs, configure
 
 def main():
     st.set_page_config(page_title="Polyglot Generator", layout="wide")
@@ -48,12 +48,14 @@ def main():
                 'verbose': True, # Capture verbose output for the log
             }
 
-            Setup(__description__, config=options)
+            # one session per request: concurrent users don't share options or outputs
+            session = Session(configure(parseArgs(__description__, config=options)))
 
             with st.spinner("Processing... this may take a moment."):
                 results, generated_files = process_files(
                     file1_name, file1_data,
-                    file2_name, file2_data
+                    file2_name, file2_data,
+                    session
                 )
 
             st.header("Results")
@@ -0,0 +1,86 @@
+import io
+import tarfile
+import zipfile
+import contextlib
+
+import segments
+from segments import view
+
+
+# Output sinks streaming all the outputs of a run into a single uncompressed archive,
+# with the output paths as member names.
+
+class Tar(object):
+	def __init__(self, path):
+		self.f = open(path, "wb")
+
+
+	def add(self, name, data):
+		with self.open(name, len(data)) as f:
+			segments.write(f, data)
+
+
+	@contextlib.contextmanager
+	def open(self, name, size):
+		"""context of a member of a known size, to write to"""
+		info = tarfile.TarInfo(name)
+		info.size = size
+		info.mode = 0o644
+		self.f.write(info.tobuf(tarfile.PAX_FORMAT))
+		yield self.f
+		self.f.write(bytes(-size % tarfile.BLOCKSIZE))
+
+
+	def close(self):
+		self.f.write(bytes(2 * tarfile.BLOCKSIZE)) # end of archive
+		self.f.close()
+
+
+class Zip(object):
+	def __init__(self, path):
+		self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_STORED)
+
+
+	def add(self, name, data):
+		with self.open(name, len(data)) as f:
+			for part in (data.parts if isinstance(data, segments.Segments) else [data]):
+				f.write(view(part))
+
+
+	def open(self, name, size):
+		info = zipfile.ZipInfo(name)
+		info.file_size = size # to switch to zip64 if needed
+		return self.zip.open(info, "w")
+
+
+	def close(self):
+		self.zip.close()
+
+
+class Collector(object):
+	"""keeps the outputs, for a worker process to send them to the archive of its parent"""
+	def __init__(self):
+		self.files = []
+
+
+	def add(self, name, data):
+		self.files.append((name, bytes(data)))
+
+
+	@contextlib.contextmanager
+	def open(self, name, size):
+		f = io.BytesIO()
+		yield f
+		self.files.append((name, f.getvalue()))
+
+
+	def flush(self):
+		files, self.files = self.files, []
+		return files
+
+
+def create(path):
+	"""returns the sink of a zip archive if path ends with .zip, of a tar archive otherwise"""
+	if path.lower().endswith(".zip"):
+		return Zip(path)
+	return Tar(path)
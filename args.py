@@ -1,4 +1,7 @@
 import argparse
+import random
+import itertools
+import contextlib
 
 
 ARGS = {
@@ -11,10 +14,52 @@ ARGS = {
 	"NOFILE"  : False,
 	"PAD"     : 0 * 1024, # FTR: 128b DICOM / 1024 kb PDF / 32Kb ISO
 	"AESGCM"  : False,
+	"ALIGN"   : 0,                 # block size the outputs are padded to (AESGCM: 16 by default)
 	"OVERLAP" : False,
+	"JOBS"    : 1,                 # worker processes running the layouts of a pair
+	"CACHE"   : "",                # directory of the cache of normalized hosts
+	"CACHE_S" : 256 * 1024 * 1024, # size budget of the cache
+	"STORE"   : "",                # directory of the content-addressed store of the outputs
+	"ARCHIVE" : "",                # tar or zip file receiving all the outputs
 }
 
 
+DEFAULTS = dict(ARGS)
+
+
+# options --sweep takes lists of values of: name -> (variable, value of the variable)
+SWEEP = {
+	"reverse": ("REVERSE", bool),
+	"overlap": ("OVERLAP", bool),
+	"pad"    : ("PAD", lambda kb: kb * 1024),
+	"aesgcm" : ("AESGCM", bool),
+	"align"  : ("ALIGN", int),
+}
+
+
+def sweepCombinations(specs):
+	"""returns the (options, vars) of every combination of the values of the specs - name=value,value..."""
+	names, values = [], []
+	for spec in specs:
+		name, _, list = spec.partition("=")
+		if name not in SWEEP:
+			raise ValueError("unknown sweep option %s (not in %s)" % (repr(name), ", ".join(SWEEP)))
+		names.append(name)
+		values.append([int(v) for v in list.split(",")])
+	combinations = []
+	for combination in itertools.product(*values):
+		options = dict(zip(names, combination))
+		vars = {SWEEP[name][0]: SWEEP[name][1](value) for name, value in options.items()}
+		combinations.append((options, vars))
+	return combinations
+
+
+assert sweepCombinations(["reverse=0,1", "pad=2"]) == [
+	({"reverse": 0, "pad": 2}, {"REVERSE": False, "PAD": 2048}),
+	({"reverse": 1, "pad": 2}, {"REVERSE": True, "PAD": 2048}),
+]
+
+
 def getVars(l):
 	global ARGS
 	return [ARGS[i] for i in l]
@@ -30,12 +75,56 @@ def setVar(k, v):
 	ARGS[k] = v
 
 
-def dprint(*args):
-	if getVar("VERBOSE"):
+def vprint(vars, *args):
+	if vars["VERBOSE"]:
 		print(("> " + " ".join(str(s) for s in args)))
 
 
-def Setup(desc, config=None):
+def dprint(*args):
+	vprint(ARGS, *args)
+
+
+class Session(object):
+	"""state of a single generation: options, random generator and generated files.
+
+	Independent sessions can run concurrently in the same process."""
+
+	def __init__(self, vars=None):
+		self.vars = dict(ARGS if vars is None else vars)
+		self.rng = random.Random(0)
+		self.files = [] # (name, data, swaps, overlap) of generated files, until flushed
+		self.profiler = None
+		self.sink = None # receives the outputs instead of the output directories (archive)
+		self.memo = None # in-memory cache shared by the runs of a resident process (serve)
+
+	def getVar(self, k):
+		return self.vars[k]
+
+	def getVars(self, l):
+		return [self.vars[i] for i in l]
+
+	def setVar(self, k, v):
+		self.vars[k] = v
+
+	def dprint(self, *args):
+		vprint(self.vars, *args)
+
+	def stage(self, name, cat="stage", **args):
+		"""context of a profiled stage - if profiling"""
+		if self.profiler is None:
+			return contextlib.nullcontext()
+		return self.profiler.stage(name, cat, **args)
+
+	def output(self, fn, data, swaps=[], overlap=b""):
+		self.files.append((fn, data, swaps, overlap))
+
+	def flush(self):
+		"""returns and forgets the files generated so far"""
+		files, self.files = self.files, []
+		return files
+
+
+def parseArgs(desc, config=None, argv=None):
 	if config:
 		# Web-based execution
 		default_args = {
@@ -50,15 +139,27 @@ def Setup(desc, config=None):
 			'pad': 0,
 			'file1': None,
 			'file2': None,
+			'matrix': None,
+			'plan': False,
+			'jobs': None,
+			'mmap': False,
+			'cache': None,
+			'cache_size': None,
+			'profile': None,
+			'store': None,
+			'archive': None,
+			'align': 0,
+			'serve': None,
+			'sweep': None,
 		}
 		default_args.update(config)
 		args = argparse.Namespace(**default_args)
 	else:
 		# Command-line execution
 		parser = argparse.ArgumentParser(description="Generate binary polyglots.")
-		parser.add_argument('file1',
+		parser.add_argument('file1', nargs='?',
 			help="first 'top' input file.")
-		parser.add_argument('file2',
+		parser.add_argument('file2', nargs='?',
 			help="second 'bottom' input file.")
 		parser.add_argument("-v", "--version", action="version", version=desc)
 		parser.add_argument('--verbose', default=False, action="store_true",
@@ -79,40 +180,102 @@ def Setup(desc, config=None):
 			help="directory for split payloads.")
 		parser.add_argument('--pad', nargs=1, type=int, default=0,
 			help="padd payloads in Kb (for expert).")
-		args = parser.parse_args()
+		parser.add_argument('--matrix', metavar='DIR',
+			help="process every ordered pair of files in DIR (replaces file1 and file2).")
+		parser.add_argument('--plan', default=False, action="store_true",
+			help="only print the possible layouts with their swaps and sizes, without generating.")
+		parser.add_argument('-j', '--jobs', type=int, default=None,
+			help="number of worker processes: for --matrix (default: CPU count), or running the layouts of a pair (default: 1).")
+		parser.add_argument('--mmap', default=False, action="store_true",
+			help="map input files in memory instead of reading them (for large hosts).")
+		parser.add_argument('--cache', metavar='DIR',
+			help="cache normalized hosts in DIR, for repeated runs with the same host.")
+		parser.add_argument('--cache-size', type=int, metavar='MB',
+			help="size budget of the cache (default: 256 MB).")
+		parser.add_argument('--profile', metavar='PREFIX',
+			help="time each stage, writing a summary to PREFIX.json and trace events to PREFIX.trace.json.")
+		parser.add_argument('--store', metavar='DIR',
+			help="write each distinct output once to DIR, with the output names as hardlinks to it.")
+		parser.add_argument('--archive', metavar='FILE',
+			help="write all outputs to a single uncompressed archive: zip if FILE ends with .zip, tar otherwise.")
+		parser.add_argument('--align', type=int, default=0, metavar='BLOCK',
+			help="pad outputs to a multiple of BLOCK bytes, for block cipher post-processing (16 for AES, 8 for Blowfish).")
+		parser.add_argument('--serve', metavar='SOCKET',
+			help="stay resident, running the jobs sent to the UNIX socket SOCKET (see client.py).")
+		parser.add_argument('--sweep', nargs='+', metavar='OPTION=VALUES',
+			help="generate with every combination of option values, identifying and normalizing the files once: "
+				"reverse, overlap, aesgcm (0 or 1), pad (Kb) and align (bytes) - as reverse=0,1 pad=0,4.")
+		args = parser.parse_args(argv)
+		if args.sweep:
+			try:
+				args.sweep = sweepCombinations(args.sweep)
+			except ValueError as e:
+				parser.error("--sweep: %s" % e)
+		if args.matrix is None and args.serve is None and (args.file1 is None or args.file2 is None):
+			parser.error("file1 and file2 are required (unless --matrix or --serve is used).")
+	return args
+
+
+def configure(args, vars=None):
+	"""returns the options set by args, on top of vars (or of the defaults)"""
+	vars = dict(DEFAULTS if vars is None else vars)
 
 	if args.verbose:
-		setVar("VERBOSE", True)
-		dprint("Arguments parsing:")
-		dprint("Verbose is ON")
+		vars["VERBOSE"] = True
+		vprint(vars, "Arguments parsing:")
+		vprint(vars, "Verbose is ON")
 
 	if args.nofile:
-		setVar("NOFILE", True)
-		dprint("NoFile is ON")
+		vars["NOFILE"] = True
+		vprint(vars, "NoFile is ON")
 
 	if args.force:
-		setVar("FORCE", True)
-		dprint("Force is ON")
+		vars["FORCE"] = True
+		vprint(vars, "Force is ON")
 
 	if args.reverse:
-		setVar("REVERSE", True)
-		dprint("Reverse is ON")
+		vars["REVERSE"] = True
+		vprint(vars, "Reverse is ON")
 
 	if args.split:
-		setVar("SPLIT", True)
-		dprint("Split is ON")
+		vars["SPLIT"] = True
+		vprint(vars, "Split is ON")
 
 	if args.overlap:
-		setVar("OVERLAP", True)
-		dprint("Overlap is ON")
+		vars["OVERLAP"] = True
+		vprint(vars, "Overlap is ON")
 
 	if args.splitdir:
-		setVar("SPLITDIR", args.splitdir)
-		dprint("Split directory output is %s" % repr(getVar("SPLITDIR")))
+		vars["SPLITDIR"] = args.splitdir
+		vprint(vars, "Split directory output is %s" % repr(vars["SPLITDIR"]))
 
 	if args.outdir:
-		setVar("OUTDIR", args.outdir)
-		dprint("Polyglots directory output is %s" % repr(getVar("OUTDIR")))
+		vars["OUTDIR"] = args.outdir
+		vprint(vars, "Polyglots directory output is %s" % repr(vars["OUTDIR"]))
+
+	if args.jobs:
+		vars["JOBS"] = args.jobs
+		vprint(vars, "Jobs set to %i" % args.jobs)
+
+	if args.cache:
+		vars["CACHE"] = args.cache
+		vprint(vars, "Cache directory is %s" % repr(vars["CACHE"]))
+
+	if args.cache_size:
+		vars["CACHE_S"] = args.cache_size * 1024 * 1024
+		vprint(vars, "Cache size set to %i MB" % args.cache_size)
+
+	if args.store:
+		vars["STORE"] = args.store
+		vprint(vars, "Output store is %s" % repr(vars["STORE"]))
+
+	if args.archive:
+		vars["ARCHIVE"] = args.archive
+		vprint(vars, "Outputs are archived to %s" % repr(vars["ARCHIVE"]))
+
+	if args.align:
+		vars["ALIGN"] = args.align
+		vprint(vars, "Outputs aligned to %i bytes" % args.align)
 
 	pad_val = args.pad
 	if isinstance(pad_val, list):
@@ -120,7 +283,13 @@ def Setup(desc, config=None):
 
 	if pad_val != 0:
 		pad = pad_val * 1024
-		setVar("PAD", pad)
-		dprint("Padding set to 0x%x" % pad)
+		vars["PAD"] = pad
+		vprint(vars, "Padding set to 0x%x" % pad)
+
+	return vars
 
+
+def Setup(desc, config=None):
+	args = parseArgs(desc, config)
+	ARGS.update(configure(args, ARGS))
 	return args
\ No newline at end of file
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+# Benchmark of Mitra on minimal samples of every format.
+#
+#  python3 -m bench run -o results.json
+#  python3 -m bench compare baseline.json results.json
+#  python3 -m bench scaling -o scaling.json
+#  python3 -m bench startup -o startup.json
+#  python3 -m bench crc -o crc.json
+#  python3 -m bench check
+#  python3 -m bench samples DIR
+
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mitra
+from bench import check, crc, run, samples, scaling, startup
+
+
+def getParsers(names):
+	if not names:
+		return None
+	byName = {samples.name(parser): parser for parser in mitra.PARSERS}
+	return [byName[name] for name in names.split(",")]
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark Mitra on minimal samples of every format.")
+	commands = parser.add_subparsers(dest="command", required=True)
+
+	p = commands.add_parser("run", help="time every layout of every ordered pair of samples.")
+	p.add_argument("-o", "--output", default="bench.json",
+		help="results file (default: bench.json).")
+	p.add_argument("-r", "--repeat", type=int, default=3,
+		help="runs per layout, the best one is kept (default: 3).")
+	p.add_argument("-p", "--parsers",
+		help="comma-separated parser modules to benchmark (default: all).")
+	p.add_argument("-v", "--verbose", action="store_true",
+		help="print each timing.")
+
+	p = commands.add_parser("compare", help="flag regressions against a baseline.")
+	p.add_argument("baseline")
+	p.add_argument("current")
+	p.add_argument("-t", "--threshold", type=float, default=0.25,
+		help="relative slowdown to flag (default: 0.25).")
+	p.add_argument("--floor", type=float, default=1e-4,
+		help="absolute slowdown in seconds below which nothing is flagged (default: 0.0001).")
+
+	p = commands.add_parser("scaling", help="time parasite hosting against the payload size.")
+	p.add_argument("-o", "--output", default="scaling.json",
+		help="results file (default: scaling.json).")
+	p.add_argument("-p", "--parsers",
+		help="comma-separated parser modules to benchmark (default: all hosting parasites).")
+	p.add_argument("-m", "--max", type=int, default=256,
+		help="maximum payload size in MB (default: 256).")
+	p.add_argument("-b", "--budget", type=float, default=10,
+		help="stop a parser's sweep after a size taking that many seconds (default: 10).")
+
+	p = commands.add_parser("startup", help="time importing Mitra and short runs, in new interpreters.")
+	p.add_argument("-o", "--output", default="startup.json",
+		help="results file (default: startup.json).")
+	p.add_argument("-r", "--repeat", type=int, default=5,
+		help="runs of each, the best one is kept (default: 5).")
+
+	p = commands.add_parser("crc", help="time the Ogg CRC implementations on random pages.")
+	p.add_argument("-o", "--output", default="crc.json",
+		help="results file (default: crc.json).")
+	p.add_argument("-r", "--repeat", type=int, default=3,
+		help="runs of each, the best one is kept (default: 3).")
+
+	p = commands.add_parser("check", help="check known properties of polyglots of the samples.")
+
+	p = commands.add_parser("samples", help="write the samples to a directory.")
+	p.add_argument("dir")
+	p.add_argument("-p", "--parsers",
+		help="comma-separated parser modules (default: all).")
+
+	args = parser.parse_args()
+
+	if args.command == "run":
+		results = run.run(getParsers(args.parsers), args.repeat, sys.stderr if args.verbose else None)
+		with open(args.output, "w") as f:
+			json.dump(results, f, indent=1, sort_keys=True)
+		errors = sum("error" in r for r in results["results"].values())
+		print("%i timings (%i errors), total %.3fs: %s" % (
+			len(results["results"]), errors, run.total(results), args.output))
+
+	elif args.command == "compare":
+		with open(args.baseline) as f:
+			baseline = json.load(f)
+		with open(args.current) as f:
+			current = json.load(f)
+		regressions = run.compare(baseline, current, args.threshold, args.floor)
+		for key, old, new in regressions:
+			if "error" in new:
+				print("%s: now fails - %s" % (key, new["error"]))
+			else:
+				print("%s: %.3fms -> %.3fms (x%.2f)" % (
+					key, old["time"] * 1e3, new["time"] * 1e3, new["time"] / old["time"]))
+		print("total: %.3fs -> %.3fs, %i regression(s)" % (
+			run.total(baseline), run.total(current), len(regressions)))
+		sys.exit(1 if regressions else 0)
+
+	elif args.command == "scaling":
+		print("%-12s %10s %12s %12s" % ("parser", "payload", "time", "peak"))
+		results = scaling.scale(getParsers(args.parsers), args.max * scaling.MB, args.budget, sys.stdout)
+		with open(args.output, "w") as f:
+			json.dump(results, f, indent=1, sort_keys=True)
+		for key, exponent in scaling.superlinear(results):
+			print("super-linear: %s x^%.2f" % (key, exponent))
+
+	elif args.command == "startup":
+		results = startup.startup(args.repeat, sys.stdout)
+		with open(args.output, "w") as f:
+			json.dump(results, f, indent=1, sort_keys=True)
+
+	elif args.command == "crc":
+		results = crc.crc(args.repeat, sys.stdout)
+		with open(args.output, "w") as f:
+			json.dump(results, f, indent=1, sort_keys=True)
+
+	elif args.command == "check":
+		failed = check.run(sys.stdout)
+		print("%i check(s), %i failed" % (len(check.CHECKS), len(failed)))
+		sys.exit(1 if failed else 0)
+
+	elif args.command == "samples":
+		os.makedirs(args.dir, exist_ok=True)
+		for parser, sample in samples.build(getParsers(args.parsers) or mitra.PARSERS):
+			with open(os.path.join(args.dir, "sample." + samples.name(parser)), "wb") as f:
+				f.write(sample)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# Regression checks of the polyglots generated from the samples.
+
+import io
+import struct
+import zipfile
+import contextlib
+import traceback
+
+import mitra
+from helpers import get4l, get4b
+from args import Session
+from bench import samples
+
+
+CHECKS = []
+
+def check(f):
+	CHECKS.append(f)
+	return f
+
+
+def generate(name1, name2, data1=None, data2=None, **vars):
+	"""returns the {name: data} of the polyglots generated from two samples - or from the given data"""
+	session = Session()
+	session.setVar("NOFILE", True)
+	for k, v in vars.items():
+		session.setVar(k, v)
+	with contextlib.redirect_stdout(io.StringIO()): # zippers print
+		_, files = mitra.process_files(
+			"1." + name1, samples.SAMPLES[name1]() if data1 is None else data1,
+			"2." + name2, samples.SAMPLES[name2]() if data2 is None else data2, session)
+	return dict(files)
+
+
+def layout(files, prefix):
+	"""returns the data of the only generated polyglot whose name starts with prefix"""
+	found = [data for fn, data in files.items() if fn.startswith(prefix)]
+	assert len(found) == 1, "%i %s* polyglots" % (len(found), prefix)
+	return found[0]
+
+
+@check
+def dcmOgg():
+	"""Ogg pages are Segments: the DCM zipper joins them"""
+	data = layout(generate("dcm", "ogg"), "Z(")
+	assert data[0x80:0x84] == b"DICM"
+
+
+@check
+def dcmRiff():
+	"""the RIFF size of a DCM zipper covers the whole file"""
+	data = layout(generate("dcm", "riff"), "Z(")
+	assert get4l(data, 4) == len(data) - 8
+
+
+@check
+def dcmFlv():
+	"""the FLV header pointer of a DCM zipper is relocated to the FLV body"""
+	data = layout(generate("dcm", "flv"), "Z(")
+	pointer = get4b(data, 5)
+	assert pointer > 9 and data[pointer:pointer + 4] == bytes(4) # PreviousTagSize0
+
+
+@check
+def wasmZip():
+	"""a zip stacked after WASM is relocated past the LEB128 size of its section, longer for larger zips"""
+	f = io.BytesIO()
+	with zipfile.ZipFile(f, "w") as zf:
+		zf.writestr("5k", bytes(5 * 1024))
+	data = layout(generate("wasm", "zip_", data2=f.getvalue()), "S(")
+	eocd_o = data.rfind(b"PK\5\6")
+	cd_o, = struct.unpack_from("<I", data, eocd_o + 16)
+	assert data[cd_o:cd_o + 4] == b"PK\1\2"
+
+
+@check
+def zipComment():
+	"""a zip whose comment contains an end record signature is relocated, a truncated zip is stacked as it is"""
+	f = io.BytesIO()
+	with zipfile.ZipFile(f, "w") as zf:
+		zf.writestr("a", b"a")
+		zf.comment = b"PK\5\6\xff\xff"
+	data = layout(generate("png", "zip_", data2=f.getvalue()), "S(")
+	eocd_o = len(data) - 22 - len(b"PK\5\6\xff\xff")
+	cd_o, = struct.unpack_from("<I", data, eocd_o + 16)
+	assert data[cd_o:cd_o + 4] == b"PK\1\2"
+
+	truncated = f.getvalue()[:-16]
+	assert layout(generate("png", "zip_", data2=truncated), "S(").endswith(truncated)
+
+
+def run(log=None):
+	"""runs every check, returns the names of the failed ones"""
+	failed = []
+	for f in CHECKS:
+		try:
+			f()
+			status = "ok"
+		except Exception:
+			failed.append(f.__name__)
+			status = "FAIL\n" + traceback.format_exc()
+		if log is not None:
+			print("%-16s %s" % (f.__name__, status), file=log)
+	return failed
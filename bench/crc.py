@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+# Times the CRC-32/Ogg of pages of growing sizes:
+# the byte per byte reference against the binascii one.
+
+import time
+import random
+
+from parsers import ogg
+from bench import run
+
+
+# a page with a single segment, a page with all its 255 full segments, and a megabyte
+SIZES = [0x1c + 0xff, 0x1b + 0xff + 0xff * 0xff, 1024 * 1024]
+
+IMPLEMENTATIONS = [("table", ogg.crc32ogg_table), ("binascii", ogg.crc32ogg)]
+
+
+def timeCrc(crc, data, repeat):
+	"""returns the best time of crc on data"""
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		crc(data)
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best
+
+
+def crc(repeat=3, log=None):
+	"""returns the timings of each implementation on random pages of each size"""
+	rng = random.Random(0)
+	results = {}
+	for size in SIZES:
+		data = rng.randbytes(size)
+		assert len(set(f(data) for _, f in IMPLEMENTATIONS)) == 1
+		for name, f in IMPLEMENTATIONS:
+			key = "%s/%i" % (name, size)
+			results[key] = {"time": timeCrc(f, data, repeat), "size": size}
+			if log is not None:
+				print("%-20s %12.3fms" % (key, results[key]["time"] * 1e3), file=log)
+	return run.report(results, repeat=repeat)
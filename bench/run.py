@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+# Times every layout of every ordered pair of samples.
+
+import io
+import sys
+import time
+import platform
+import functools
+import contextlib
+
+import mitra
+from args import Session
+from bench import samples
+
+
+def getSession():
+	session = Session()
+	session.setVar("NOFILE", True)
+	session.setVar("OVERLAP", True)
+	return session
+
+
+def identified(parser, sample):
+	ftype = parser.parser(sample)
+	ftype.identify()
+	return ftype
+
+
+def timeLayout(layout, pair, session, repeat):
+	"""returns the best time of a layout and the total size of what it generated"""
+	(parser1, sample1), (parser2, sample2) = pair
+	fn1 = "1." + samples.name(parser1)
+	fn2 = "2." + samples.name(parser2)
+	best = None
+	for _ in range(repeat):
+		# parsers keep state while generating: start from fresh ones
+		ftype1 = identified(parser1, sample1)
+		ftype2 = identified(parser2, sample2)
+		start = time.perf_counter()
+		layout(ftype1, ftype2, fn1, fn2, [], session)
+		elapsed = time.perf_counter() - start
+		files = session.flush()
+		best = elapsed if best is None else min(best, elapsed)
+	return best, sum(len(data) for _, data, _, _ in files)
+
+
+def timeFiles(pair, repeat):
+	"""returns the best time of process_files - identification included"""
+	(parser1, sample1), (parser2, sample2) = pair
+	fn1 = "1." + samples.name(parser1)
+	fn2 = "2." + samples.name(parser2)
+	best = None
+	for _ in range(repeat):
+		session = getSession()
+		start = time.perf_counter()
+		_, files = mitra.process_files(fn1, sample1, fn2, sample2, session)
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best, sum(len(data) for _, data in files)
+
+
+def run(parsers=None, repeat=3, log=None):
+	"""returns the timings of all layouts of all ordered pairs of samples of parsers"""
+	session = getSession()
+	built = samples.build(mitra.PARSERS if parsers is None else parsers)
+	results = {}
+	for pair in [(a, b) for a in built for b in built if a is not b]:
+		(parser1, _), (parser2, _) = pair
+		if parser1.parser.TYPE == parser2.parser.TYPE:
+			continue
+		timers = [(layout.__name__, functools.partial(timeLayout, layout, pair, session, repeat))
+			for layout in mitra.getLayouts(session)]
+		timers += [("process_files", functools.partial(timeFiles, pair, repeat))]
+		for name, timer in timers:
+			key = "%s>%s/%s" % (samples.name(parser1), samples.name(parser2), name)
+			try:
+				# some parsers print their progress
+				with contextlib.redirect_stdout(io.StringIO()):
+					elapsed, size = timer()
+				results[key] = {"time": elapsed, "size": size}
+			except Exception as e:
+				results[key] = {"error": repr(e)}
+			if log is not None:
+				print(key, results[key], file=log)
+	return report(results, repeat=repeat)
+
+
+def report(results, **info):
+	"""results, with the environment they were measured in"""
+	return dict(info,
+		python=sys.version.split()[0],
+		platform=platform.platform(),
+		results=results,
+	)
+
+
+def compare(baseline, current, threshold=0.25, floor=1e-4):
+	"""returns the regressions of current against baseline: [(key, old, new)].
+
+	A layout regresses if it's slower by more than threshold (relative)
+	and floor (in seconds), or if it fails where it used to work."""
+	regressions = []
+	old_results, new_results = baseline["results"], current["results"]
+	for key in sorted(set(old_results) & set(new_results)):
+		old, new = old_results[key], new_results[key]
+		if "error" in old:
+			continue
+		if "error" in new:
+			regressions.append((key, old, new))
+		elif new["time"] > old["time"] * (1 + threshold) and new["time"] - old["time"] > floor:
+			regressions.append((key, old, new))
+	return regressions
+
+
+def total(results):
+	return sum(r["time"] for r in results["results"].values() if "error" not in r)
@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+
+# Minimal samples of every format, built from scratch:
+# small but structurally valid, so that every parser can be exercised
+# without collecting real files.
+
+import io
+import bz2
+import lzma
+import gzip
+import zlib
+import struct
+import tarfile
+import zipfile
+import binascii
+
+from helpers import int2b, int2l, int4b, int4l
+from parsers.ogg import crc32ogg
+
+
+def chunk(type_, data):
+	"""PNG chunk"""
+	return int4b(len(data)) + type_ + data + int4b(binascii.crc32(type_ + data))
+
+
+def png():
+	return b"".join([
+		b"\x89PNG\r\n\x1a\n",
+		chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0)), # 1x1, 8b greyscale
+		chunk(b"IDAT", zlib.compress(b"\0\0")),
+		chunk(b"IEND", b""),
+	])
+
+
+def jpg():
+	# 8x8 grey: one block with no coefficient, one code per Huffman table
+	segment = lambda marker, data: b"\xff" + marker + int2b(len(data) + 2) + data
+	return b"".join([
+		b"\xff\xd8",
+		segment(b"\xe0", b"JFIF\0\1\1\0\0\1\0\1\0\0"),
+		segment(b"\xdb", b"\0" + b"\1" * 64),
+		segment(b"\xc0", b"\x08\0\x08\0\x08\x01\x01\x11\0"),
+		segment(b"\xc4", b"\x00" + b"\1" + b"\0" * 15 + b"\0"), # DC: 1 code, category 0
+		segment(b"\xc4", b"\x10" + b"\1" + b"\0" * 15 + b"\0"), # AC: 1 code, EOB
+		segment(b"\xda", b"\x01\x01\x00\x00\x3f\x00"),
+		b"\x3f", # DC 0, EOB
+		b"\xff\xd9",
+	])
+
+
+def gif():
+	return b"".join([
+		b"GIF89a",
+		b"\1\0\1\0\x80\0\0",  # 1x1, 2-color global table
+		b"\0\0\0\xff\xff\xff",
+		b",\0\0\0\0\1\0\1\0\0", # image descriptor
+		b"\2\2\x44\x01\0",    # LZW data
+		b";",
+	])
+
+
+def bmp():
+	pixels = b"\0\0\xff\0" # 1 red pixel, padded row
+	return b"".join([
+		b"BM",
+		int4l(14 + 12 + len(pixels)),
+		b"\0" * 4,
+		int4l(14 + 12),
+		int4l(12), int2l(1), int2l(1), int2l(1), int2l(24), # BitmapCoreHeader
+		pixels,
+	])
+
+
+def bpg():
+	# yuv420 8b, no extension, 1x1, 1 byte of picture data
+	return b"BPG\xfb" + b"\0\0" + b"\1\1\1" + b"\0"
+
+
+def ico():
+	image = png()
+	return b"".join([
+		b"\0\0\1\0", int2l(1),
+		b"\1\1\0\0", int2l(1), int2l(32), int4l(len(image)), int4l(6 + 0x10),
+		image,
+	])
+
+
+def icc():
+	tag = b"text\0\0\0\0mitra\0\0\0"
+	table = b"cprt" + int4b(0x84 + 12) + int4b(len(tag))
+	size = 0x80 + 4 + len(table) + len(tag)
+	header = b"".join([
+		int4b(size),
+		b"\0" * 4,
+		b"\x02\x10\0\0",  # version
+		b"mntrRGB XYZ ",
+		b"\0" * 12,       # date
+		b"acsp",
+	]).ljust(0x80, b"\0")
+	return header + int4b(1) + table + tag
+
+
+def ilda():
+	header = lambda count: b"".join([
+		b"ILDA", b"\0\0\0", b"\2",
+		b"\0" * 16,
+		int2b(count), b"\0\0", b"\0\0", b"\0", b"\0",
+	])
+	return header(1) + b"\xff\0\0" + header(0)
+
+
+def jp2():
+	return b"".join([
+		b"\0\0\0\x0cjP  \r\n\x87\n",
+		int4b(20), b"ftyp", b"jp2 ", b"\0" * 4, b"jp2 ",
+		int4b(8), b"jp2h",
+	])
+
+
+def psd():
+	return b"".join([
+		b"8BPS", int2b(1), b"\0" * 6,
+		int2b(1), int4b(1), int4b(1), int2b(8), int2b(1), # 1 channel, 1x1, 8b, greyscale
+		int4b(0), # color mode data
+		int4b(0), # image resources
+		int4b(0), # layer and mask
+		int2b(0), b"\0", # raw image data
+	])
+
+
+def svg():
+	return b'<svg xmlns="http://www.w3.org/2000/svg" width="1" height="1"><rect width="1" height="1"/></svg>\n'
+
+
+def tiff():
+	entries = [
+		# tag, type, count, value
+		(256, 3, 1, 1), # ImageWidth
+		(257, 3, 1, 1), # ImageLength
+		(258, 3, 1, 8), # BitsPerSample
+		(259, 3, 1, 1), # Compression: none
+		(262, 3, 1, 1), # Photometric: black is zero
+		(273, 4, 1, 0), # StripOffsets - set below
+		(278, 3, 1, 1), # RowsPerStrip
+		(279, 4, 1, 1), # StripByteCounts
+	]
+	ifd_s = 2 + 12 * len(entries) + 4
+	ifd = int2l(len(entries))
+	for tag, type_, count, value in entries:
+		if tag == 273:
+			value = 8 + ifd_s
+		ifd += struct.pack("<HHI", tag, type_, count) + (int2l(value) + b"\0\0" if type_ == 3 else int4l(value))
+	ifd += int4l(0)
+	return b"II\x2a\0" + int4l(8) + ifd + b"\x80"
+
+
+def riff():
+	fmt = b"\1\0\1\0" + int4l(8000) + int4l(8000) + b"\1\0\x08\0" # PCM 8kHz 8b mono
+	data = b"\x80" * 16
+	chunks = b"fmt " + int4l(len(fmt)) + fmt + b"data" + int4l(len(data)) + data
+	return b"RIFF" + int4l(4 + len(chunks)) + b"WAVE" + chunks
+
+
+def ogg_page(type_, serial, seq, packet):
+	assert len(packet) < 255
+	page = b"".join([
+		b"OggS", b"\0", bytes([type_]),
+		b"\0" * 8,
+		int4l(serial), int4l(seq),
+		b"\0" * 4,
+		b"\1", bytes([len(packet)]),
+		packet,
+	])
+	return page[:0x16] + int4l(crc32ogg(page)) + page[0x16 + 4:]
+
+
+def ogg():
+	ident = b"\1vorbis" + int4l(0) + b"\1" + int4l(8000) + int4l(0) * 3 + b"\xb8\1"
+	comment = b"\3vorbis" + int4l(5) + b"mitra" + int4l(0) + b"\1"
+	return ogg_page(2, 1, 0, ident) + ogg_page(0, 1, 1, comment) + ogg_page(4, 1, 2, b"")
+
+
+def mp4():
+	mdat = b"\0" * 16
+	ftyp = int4b(20) + b"ftyp" + b"isom" + int4b(0) + b"isom"
+	stco = int4b(16 + 4) + b"stco" + int4b(0) + int4b(1) + int4b(0)
+	stbl = int4b(8 + len(stco)) + b"stbl" + stco
+	minf = int4b(8 + len(stbl)) + b"minf" + stbl
+	mdia = int4b(8 + len(minf)) + b"mdia" + minf
+	trak = int4b(8 + len(mdia)) + b"trak" + mdia
+	moov = int4b(8 + len(trak)) + b"moov" + trak
+	# the only chunk offset points to the mdat data
+	data_o = len(ftyp) + len(moov) + 8
+	moov = moov[:-4] + int4b(data_o)
+	return ftyp + moov + int4b(8 + len(mdat)) + b"mdat" + mdat
+
+
+def ebml():
+	def element(id_, data):
+		return id_ + bytes([0x80 | len(data)]) + data
+	header = element(b"\x42\x86", b"\1") + element(b"\x42\x82", b"webm")
+	return element(b"\x1a\x45\xdf\xa3", header) + b"\x18\x53\x80\x67" + b"\x01\0\0\0\0\0\0\0"
+
+
+def flv():
+	return b"FLV\1\1" + int4b(9) + int4b(0) # audio only, no tag
+
+
+def flac():
+	streaminfo = b"".join([
+		int2b(4096), int2b(4096), # block sizes
+		b"\0\0\0", b"\0\0\0",     # frame sizes
+		# 8kHz, 1 channel, 8b, no samples
+		struct.pack(">Q", (8000 << 44) | (0 << 41) | (7 << 36)),
+		b"\0" * 16,               # MD5
+	])
+	return b"fLaC" + b"\x80" + int4b(len(streaminfo))[1:] + streaminfo
+
+
+def mp3_frame():
+	# MPEG-1 layer III, 128kbps, 44.1kHz, no padding: 417 bytes
+	return b"\xff\xfb\x90\x00" + b"\0" * (417 - 4)
+
+
+def mp3():
+	return mp3_frame() * 2
+
+
+def id3v2():
+	frame = b"TIT2" + int4b(6) + b"\0\0" + b"\0mitra"
+	return b"ID3\3\0\0" + b"\0\0\0" + bytes([len(frame)]) + frame + mp3_frame()
+
+
+def id3v1():
+	return mp3_frame() + b"TAG" + b"mitra".ljust(30, b"\0") + b"\0" * 30 * 3 + b"\0" * 4 + b"\xff"
+
+
+def pdf_objects(objects):
+	"""builds a PDF with a classic xref table from a list of object contents"""
+	pdf = b"%PDF-1.3\n%\xb5\xb6\n\n"
+	offsets = []
+	for i, contents in enumerate(objects):
+		offsets.append(len(pdf))
+		pdf += b"%i 0 obj\n%s\nendobj\n\n" % (i + 1, contents)
+	xref_o = len(pdf)
+	pdf += b"xref\n0 %i\n0000000000 65535 f \n" % (len(objects) + 1)
+	for offset in offsets:
+		pdf += b"%010i 00000 n \n" % offset
+	pdf += b"\ntrailer\n<</Size %i/Root 1 0 R>>\nstartxref\n%i\n%%%%EOF\n" % (len(objects) + 1, xref_o)
+	return pdf
+
+
+def pdf():
+	stream = b"BT /F1 12 Tf 10 10 Td (mitra) Tj ET"
+	return pdf_objects([
+		b"<</Type/Catalog/Pages 2 0 R>>",
+		b"<</Type/Pages/Count 1/Kids[3 0 R]>>",
+		b"<</Type/Page/Parent 2 0 R/MediaBox[0 0 100 100]/Contents 4 0 R/Resources<</Font<</F1 5 0 R>>>>>>",
+		b"<</Length %i>>\nstream\n%s\nendstream" % (len(stream), stream),
+		b"<</Type/Font/Subtype/Type1/BaseFont/Helvetica>>",
+	])
+
+
+def pdfc():
+	# the signature as far as possible, after a comment
+	header = b"%" + b" " * (1018 - 2) + b"\n"
+	return header + pdf()
+
+
+def postscript():
+	return b"%!PS\n/Helvetica findfont 12 scalefont setfont\n10 10 moveto (mitra) show\nshowpage\n"
+
+
+def rtf():
+	return b"{\\rtf1\\ansi{\\fonttbl\\f0\\fswiss Helvetica;}\\f0 mitra}\n"
+
+
+def pe():
+	sections_o = 0x200
+	code = b"\xc3".ljust(0x200, b"\0") # ret
+	optional = b"".join([
+		int2l(0x10b), b"\0\0",      # PE32, linker version
+		int4l(len(code)), int4l(0), int4l(0),
+		int4l(0x1000), int4l(0x1000), int4l(0x1000), # entry point, bases of code and data
+		int4l(0x400000),
+		int4l(0x1000), int4l(0x200), # section and file alignments
+		int2l(4), int2l(0), int2l(0), int2l(0), int2l(4), int2l(0), # versions
+		int4l(0),
+		int4l(0x2000), int4l(sections_o), int4l(0), # size of image and headers, checksum
+		int2l(2), int2l(0),          # GUI, no DLL characteristics
+		int4l(0x100000), int4l(0x1000), int4l(0x100000), int4l(0x1000),
+		int4l(0),
+		int4l(16), b"\0" * 16 * 8,   # data directories
+	])
+	section = b"".join([
+		b".text\0\0\0",
+		int4l(len(code)), int4l(0x1000), int4l(len(code)), int4l(sections_o),
+		b"\0" * 12,
+		int4l(0x60000020),
+	])
+	headers = b"".join([
+		b"MZ".ljust(0x3c, b"\0"), int4l(0x40),
+		b"PE\0\0",
+		int2l(0x14c), int2l(1), int4l(0), int4l(0), int4l(0), int2l(len(optional)), int2l(0x102),
+		optional,
+		section,
+	])
+	return headers.ljust(sections_o, b"\0") + code
+
+
+pe_hdr = pe_sec = pe
+
+
+def elf():
+	code = b"\xb8\x01\0\0\0\xbb\0\0\0\0\xcd\x80".ljust(16, b"\0") # exit(0)
+	code_o = 0x34 + 0x20
+	sh_o = code_o + len(code)
+	header = b"".join([
+		b"\x7fELF\1\1\1".ljust(16, b"\0"),
+		int2l(2), int2l(3), int4l(1),     # executable, x86
+		int4l(0x8048000 + code_o), int4l(0x34), int4l(sh_o),
+		int4l(0), int2l(0x34),
+		int2l(0x20), int2l(1),            # program headers
+		int2l(0x28), int2l(2), int2l(0),  # section headers
+	])
+	program = struct.pack("<8I", 1, 0, 0x8048000, 0x8048000, sh_o, sh_o, 5, 0x1000)
+	sections = b"\0" * 0x28 + struct.pack("<10I", 0, 1, 6, 0x8048000 + code_o, code_o, len(code), 0, 0, 16, 0)
+	return header + program + code + sections
+
+
+def nes():
+	return b"NES\x1a" + b"\1\0\0\0" + b"\0" * 8 + b"\0" * 0x4000
+
+
+def wasm():
+	# a single empty type section
+	return b"\0asm\1\0\0\0" + b"\1\1\0"
+
+
+def java():
+	pool = [
+		b"\1" + int2b(1) + b"A",          # 1: Utf8 A
+		b"\7" + int2b(1),                 # 2: Class A
+		b"\1" + int2b(16) + b"java/lang/Object",
+		b"\7" + int2b(3),                 # 4: Class Object
+	]
+	return b"".join([
+		b"\xca\xfe\xba\xbe", int2b(0), int2b(50),
+		int2b(len(pool) + 1), b"".join(pool),
+		int2b(0x21), int2b(2), int2b(4),
+		int2b(0), int2b(0), int2b(0), int2b(0),
+	])
+
+
+def lnk():
+	return b"".join([
+		binascii.unhexlify("4C000000" + "0114020000000000C000000000000046"),
+		b"\0" * (0x4c - 20),
+		int2l(0), # no extra data
+	])
+
+
+def _7z():
+	# empty archive: start header only
+	start = struct.pack("<QQI", 0, 0, 0)
+	return b"7z\xbc\xaf\x27\x1c" + b"\0\4" + int4l(zlib.crc32(start)) + start
+
+
+def ar():
+	data = b"mitra\n"
+	return b"!<arch>\n" + b"".join([
+		b"a.txt/".ljust(16),
+		b"0".ljust(12), b"0".ljust(6), b"0".ljust(6), b"644".ljust(8),
+		str(len(data)).encode().ljust(10),
+		b"`\n",
+	]) + data
+
+
+def arj():
+	# main header only, then the end of archive
+	header = b"".join([
+		bytes([30, 11, 1, 1, 2, 0, 2, 0]), # header size, version, OS, flags, type...
+		b"\0" * 22,
+		b"a.arj\0", b"\0",
+	])
+	return b"\x60\xea" + int2l(len(header)) + header + int4l(zlib.crc32(header)) + b"\0\0" + b"\x60\xea\0\0"
+
+
+def cab():
+	data = b"mitra\n"
+	name = b"a.txt\0"
+	files_o = 0x24 + 8
+	data_o = files_o + 16 + len(name)
+	return b"".join([
+		b"MSCF", int4l(0), int4l(data_o + 8 + len(data)), int4l(0),
+		int4l(files_o), int4l(0), b"\3\1", int2l(1), int2l(1), int2l(0), int2l(0), int2l(0),
+		int4l(data_o), int2l(1), int2l(0),                       # folder: 1 uncompressed block
+		int4l(len(data)), int4l(0), int2l(0), int2l(0x21), int2l(0), int2l(0x20), name,
+		int4l(0), int2l(len(data)), int2l(len(data)), data,       # data block, no checksum
+	])
+
+
+def cpio():
+	def member(name, data):
+		name += b"\0"
+		return b"".join([
+			b"\xc7\x71", b"\0\0" * 7, b"\0\0" * 2,
+			int2l(len(name)), b"\0\0", int2l(len(data)),
+			name, b"\0" * (len(name) % 2),
+			data, b"\0" * (len(data) % 2),
+		])
+	archive = member(b"a.txt", b"mitra\n") + member(b"TRAILER!!!", b"")
+	return archive.ljust(512, b"\0")
+
+
+def dcm():
+	meta = b"\2\0\1\0OB\0\0" + int4l(2) + b"\0\1"   # (0002,0001) version
+	return b"".join([
+		b"\0" * 0x80,
+		b"DICM",
+		b"\2\0\0\0UL" + int2l(4) + int4l(len(meta)), # (0002,0000) group length
+		meta,
+	])
+
+
+def gzip_():
+	return gzip.compress(b"mitra\n", mtime=0)
+
+
+def bzip2():
+	return bz2.compress(b"mitra\n")
+
+
+def xz():
+	return lzma.compress(b"mitra\n", format=lzma.FORMAT_XZ)
+
+
+def zstd():
+	data = b"mitra\n"
+	# single segment frame, raw last block
+	return b"\x28\xb5\x2f\xfd" + b"\x20" + bytes([len(data)]) + int4l((len(data) << 3) | 1)[:3] + data
+
+
+def iso():
+	pvd = b"\1CD001\1".ljust(0x800, b"\0")
+	terminator = b"\xffCD001\1".ljust(0x800, b"\0")
+	return b"\0" * 0x8000 + pvd + terminator
+
+
+def rar():
+	# RAR 4: marker, archive header, end of archive
+	return b"Rar!\x1a\7\0" + b"\xcf\x90\x73\0\0\x0d\0\0\0\0\0\0\0" + b"\xc4\x3d\x7b\0\x40\7\0"
+
+
+def tar():
+	info = tarfile.TarInfo("a.txt")
+	info.size = 6
+	out = io.BytesIO()
+	with tarfile.open(fileobj=out, mode="w", format=tarfile.USTAR_FORMAT) as f:
+		f.addfile(info, io.BytesIO(b"mitra\n"))
+	return out.getvalue()
+
+
+def wad():
+	lump = b"mitra\n\0\0"
+	return b"PWAD" + int4l(1) + int4l(12 + len(lump)) + lump + int4l(12) + int4l(len(lump)) + b"MITRA\0\0\0"
+
+
+def zip_():
+	out = io.BytesIO()
+	with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as f:
+		f.writestr(zipfile.ZipInfo("a.txt", date_time=(1981, 2, 3, 4, 5, 6)), b"mitra\n")
+	return out.getvalue()
+
+
+def pcap():
+	packet = b"\0" * 12 + b"\x08\0" + b"\0" * 46 # empty ethernet frame
+	return b"".join([
+		b"\xd4\xc3\xb2\xa1", int2l(2), int2l(4), int4l(0), int4l(0), int4l(0xffff), int4l(1),
+		int4l(0), int4l(0), int4l(len(packet)), int4l(len(packet)),
+		packet,
+	])
+
+
+def pcapng():
+	block = lambda type_, body: int4l(type_) + int4l(12 + len(body)) + body + int4l(12 + len(body))
+	return b"".join([
+		block(0x0a0d0d0a, b"\x4d\x3c\x2b\x1a" + int2l(1) + int2l(0) + b"\xff" * 8), # section header
+		block(1, int2l(1) + int2l(0) + int4l(0)), # interface description: ethernet
+	])
+
+
+# samples per parser module
+SAMPLES = {
+	"_7z": _7z, "ar": ar, "arj": arj, "bmp": bmp, "bpg": bpg, "bzip2": bzip2, "cab": cab,
+	"cpio": cpio, "dcm": dcm, "ebml": ebml, "elf": elf, "flac": flac, "flv": flv,
+	"gif": gif, "gzip": gzip_, "icc": icc, "ico": ico, "id3v1": id3v1, "id3v2": id3v2,
+	"ilda": ilda, "iso": iso, "java": java, "jp2": jp2, "jpg": jpg, "lnk": lnk, "mp3": mp3,
+	"mp4": mp4, "nes": nes, "ogg": ogg, "pcap": pcap, "pcapng": pcapng, "pdf": pdf,
+	"pdfc": pdfc, "pe_hdr": pe_hdr, "pe_sec": pe_sec, "png": png, "postscript": postscript,
+	"psd": psd, "rar": rar, "riff": riff, "rtf": rtf, "svg": svg, "tar": tar, "tiff": tiff,
+	"wad": wad, "wasm": wasm, "xz": xz, "zip_": zip_, "zstd": zstd,
+}
+
+
+def name(parser):
+	"""name of a parser module"""
+	return parser.__name__.split(".")[-1]
+
+
+def build(parsers):
+	"""returns [(parser module, sample)] - the sample identifies as that parser"""
+	samples = []
+	for parser in parsers:
+		sample = SAMPLES[name(parser)]()
+		assert parser.parser(sample).identify(), name(parser)
+		samples.append((parser, sample))
+	return samples
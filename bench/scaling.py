@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+# Times parasite hosting against the payload size,
+# to expose super-linear paths (quadratic concatenations, byte-per-byte loops...).
+
+import io
+import os
+import math
+import time
+import tracemalloc
+import contextlib
+
+import mitra
+import archive
+from parsers import blob
+from bench import run, samples
+
+
+KB = 1024
+MB = 1024 * KB
+
+
+def getSession():
+	session = run.getSession()
+	# outputs and separate payloads are written, but discarded
+	session.setVar("NOFILE", False)
+	session.setVar("SPLIT", True)
+	session.sink = archive.Tar(os.devnull)
+	return session
+
+
+def hosts(parsers):
+	"""returns the (parser, sample) of the parsers that accept parasites"""
+	return [(parser, sample) for parser, sample in samples.build(parsers)
+		if run.identified(parser, sample).bParasite]
+
+
+def sizes(parasite_s, minimum=KB, maximum=256 * MB, factor=4):
+	"""payload sizes from minimum to the parser's max parasite size (capped), by factor"""
+	size = minimum
+	while size < min(parasite_s, maximum):
+		yield size
+		size *= factor
+	yield min(parasite_s, maximum)
+
+
+def parasite(parser, sample, payload, session):
+	ftype1 = run.identified(parser, sample)
+	ftype2 = blob.reader(payload)
+	with contextlib.redirect_stdout(io.StringIO()):
+		mitra.Parasite(ftype1, ftype2, "1." + samples.name(parser), "2.bin", [], session)
+	return session.flush()
+
+
+def measure(parser, sample, size):
+	"""returns the time and the peak allocated memory of hosting a payload of that size"""
+	payload = bytes(size)
+	session = getSession()
+
+	start = time.perf_counter()
+	files = parasite(parser, sample, payload, session)
+	elapsed = time.perf_counter() - start
+
+	# traced separately: tracing slows down allocations
+	tracemalloc.start()
+	parasite(parser, sample, payload, session)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	session.sink.close()
+
+	return {
+		"time": elapsed,
+		"peak": peak,
+		"size": sum(len(data) for _, data, _, _ in files),
+	}
+
+
+def exponent(small, big):
+	"""growth exponent of time between two (payload size, measure): 1 is linear"""
+	(size1, m1), (size2, m2) = small, big
+	if size1 == size2 or m1["time"] <= 0:
+		return None
+	return math.log(m2["time"] / m1["time"]) / math.log(size2 / size1)
+
+
+def scale(parsers=None, maximum=256 * MB, budget=10, log=None):
+	"""returns the measures of parasite hosting per parser and payload size.
+
+	A parser's sweep stops after a size that took more than budget seconds."""
+	results = {}
+	for parser, sample in hosts(mitra.PARSERS if parsers is None else parsers):
+		measures = []
+		for size in sizes(run.identified(parser, sample).parasite_s, maximum=maximum):
+			try:
+				m = measure(parser, sample, size)
+			except Exception as e:
+				results["%s/%i" % (samples.name(parser), size)] = {"error": repr(e)}
+				break
+			if measures:
+				m["exponent"] = exponent(measures[-1], (size, m))
+			measures.append((size, m))
+			results["%s/%i" % (samples.name(parser), size)] = m
+			if log is not None:
+				print("%-12s %10i %10.3fms %12i %s" % (samples.name(parser), size, m["time"] * 1e3, m["peak"],
+					"" if m.get("exponent") is None else "x^%.2f" % m["exponent"]), file=log)
+			if m["time"] > budget:
+				break
+	return run.report(results, maximum=maximum)
+
+
+def superlinear(results, threshold=1.3, minimum=64 * KB):
+	"""returns the (key, exponent) of the measures growing faster than linearly.
+
+	Small payloads are ignored: fixed costs dominate them."""
+	found = []
+	for key, m in sorted(results["results"].items()):
+		size = int(key.split("/")[-1])
+		if size >= minimum and (m.get("exponent") or 0) > threshold:
+			found.append((key, m["exponent"]))
+	return found
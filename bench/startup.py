@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+# Times the startup of Mitra: importing it, and short runs on small samples,
+# each in a new interpreter.
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+from bench import run, samples
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# pairs of parsers for short runs: no PDF, then with a PDF host
+PAIRS = [("png", "gif"), ("pdf", "jpg")]
+
+# prints the parser modules imported to identify the files
+IMPORTED = """
+import sys, mitra
+for fn in sys.argv[1:]:
+	with open(fn, "rb") as f:
+		mitra.identify(f.read())
+print(" ".join(sorted(m[8:] for m in sys.modules if m.startswith("parsers."))))
+"""
+
+
+def python(args, repeat):
+	"""returns the best time of running python with args, from the repository"""
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		subprocess.run([sys.executable] + args, cwd=ROOT, check=True,
+			stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best
+
+
+def imported(fns):
+	"""returns the parser modules imported to identify the files"""
+	out = subprocess.run([sys.executable, "-c", IMPORTED] + fns, cwd=ROOT, check=True,
+		capture_output=True, text=True).stdout
+	return out.split()
+
+
+def startup(repeat=5, log=None):
+	"""returns the startup times: interpreter alone, import, and short runs"""
+	results = {
+		"python": {"time": python(["-c", "pass"], repeat)},
+		"import": {"time": python(["-c", "import mitra"], repeat)},
+	}
+	with tempfile.TemporaryDirectory() as dir:
+		for pair in PAIRS:
+			fns = []
+			for name in pair:
+				fn = os.path.join(dir, "sample." + name)
+				with open(fn, "wb") as f:
+					f.write(samples.SAMPLES[name]())
+				fns.append(fn)
+			key = "run/%s>%s" % pair
+			results[key] = {
+				"time": python(["mitra.py", "--nofile"] + fns, repeat),
+				"imported": imported(fns),
+			}
+	if log is not None:
+		for key, r in results.items():
+			print("%-16s %8.1fms %s" % (key, r["time"] * 1e3, " ".join(r.get("imported", []))), file=log)
+	return run.report(results, repeat=repeat)
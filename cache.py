@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import hashlib
+import functools
+
+import store
+import segments
+from parsers import FType
+
+
+# On-disk cache of normalized hosts.
+#
+# Each entry is a file named after the key of the host:
+# a JSON line of the attributes set by normalize, then the normalized data
+# (if normalize changed it).
+# Entries are touched when used and the least recently used ones are evicted
+# when the cache exceeds its size budget.
+
+VERSIONS = {}
+
+
+def version(ftype):
+	"""returns the hash of the source of the parser module, so that changing a parser invalidates its entries"""
+	module = type(ftype).__module__
+	if module not in VERSIONS:
+		with open(sys.modules[module].__file__, "rb") as f:
+			VERSIONS[module] = hashlib.sha256(f.read()).hexdigest()[:16]
+	return VERSIONS[module]
+
+
+def serializable(attrs):
+	try:
+		return json.loads(json.dumps(attrs)) == attrs
+	except (TypeError, ValueError):
+		return False
+
+
+class Cache(object):
+	def __init__(self, dir, budget):
+		self.dir = dir
+		self.budget = budget
+		os.makedirs(dir, exist_ok=True)
+
+
+	def key(self, ftype):
+		return "%s-%s-%s" % (
+			segments.sha256(ftype.data).hexdigest(),
+			ftype.TYPE.replace("/", "_"),
+			version(ftype),
+		)
+
+
+	def load(self, key):
+		"""returns the (attributes, data) of an entry, or None"""
+		fn = os.path.join(self.dir, key)
+		try:
+			with open(fn, "rb") as f:
+				attrs = json.loads(f.readline())
+				data = f.read()
+			os.utime(fn)
+		except (OSError, ValueError): # missing, evicted meanwhile, or truncated
+			return None
+		return attrs, data
+
+
+	def store(self, key, attrs, data):
+		fn = os.path.join(self.dir, key)
+		tmp = store.tmpName(fn)
+		with open(tmp, "wb") as f:
+			f.write(json.dumps(attrs).encode() + b"\n")
+			f.write(data)
+		os.replace(tmp, fn)
+		self.evict()
+
+
+	def evict(self):
+		"""removes the least recently used entries until the cache fits its budget"""
+		entries = []
+		for entry in os.scandir(self.dir):
+			if entry.name.endswith(".tmp"):
+				continue
+			try:
+				st = entry.stat()
+			except OSError:
+				continue
+			entries.append((st.st_mtime, st.st_size, entry.path))
+
+		total = sum(size for _, size, _ in entries)
+		for _, size, path in sorted(entries):
+			if total <= self.budget:
+				break
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+			total -= size
+
+
+	def normalize(self, ftype, normalize):
+		"""normalizes ftype, from the cache if possible"""
+		key = self.key(ftype)
+		entry = self.load(key)
+		if entry is not None:
+			attrs, data = entry
+			changed, mutable = attrs.pop("_changed"), attrs.pop("_mutable")
+			if changed:
+				ftype.data = bytearray(data) if mutable else data
+			vars(ftype).update(attrs)
+			return
+
+		before = dict(vars(ftype))
+		normalize()
+		attrs = {k: v for k, v in vars(ftype).items()
+			if k not in ["data", "normalize"] and (k not in before or before[k] != v)}
+		if not serializable(attrs):
+			return
+		attrs["_changed"] = ftype.data is not before["data"]
+		attrs["_mutable"] = isinstance(ftype.data, bytearray)
+		self.store(key, attrs, ftype.data if attrs["_changed"] else b"")
+
+
+	def attach(self, ftype):
+		"""makes ftype normalize through the cache"""
+		if type(ftype).normalize is FType.normalize or "normalize" in vars(ftype):
+			return # nothing to normalize, or already attached
+		ftype.normalize = functools.partial(self.normalize, ftype, ftype.normalize)
+
+
+class Memory(Cache):
+	"""in-memory cache, for the runs of a resident process: identified files and normalized hosts"""
+	def __init__(self, entries=64):
+		self.entries = entries
+		self.normalized = {}
+		self.identified = {}
+
+
+	def load(self, key):
+		entry = self.normalized.pop(key, None)
+		if entry is None:
+			return None
+		self.normalized[key] = entry # most recently used last
+		attrs, data = entry
+		return json.loads(attrs), data # attributes are not shared between instances
+
+
+	def store(self, key, attrs, data):
+		self.normalized[key] = json.dumps(attrs), data
+		self.trim(self.normalized)
+
+
+	def trim(self, entries):
+		while len(entries) > self.entries:
+			del entries[next(iter(entries))]
+
+
+	def identify(self, fdata, identify):
+		"""returns identify(fdata), once per content: identified files are never changed"""
+		key = segments.sha256(fdata).hexdigest()
+		if key not in self.identified:
+			self.identified[key] = identify(fdata)
+			self.trim(self.identified)
+		return self.identified[key]
+
+
+def attach(session, *ftypes):
+	"""makes the ftypes normalize through the session cache, if any"""
+	if session.memo is not None:
+		cache = session.memo
+	elif session.getVar("CACHE"):
+		cache = Cache(session.getVar("CACHE"), session.getVar("CACHE_S"))
+	else:
+		return
+	for ftype in ftypes:
+		if ftype is not None:
+			cache.attach(ftype)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+# Thin client of a Mitra server (mitra.py --serve SOCKET):
+# takes the same arguments as mitra.py and runs them on the server.
+#
+#  python3 client.py --socket SOCKET [--send] <mitra.py arguments>
+
+import os
+import sys
+import json
+import base64
+import socket
+import argparse
+
+from args import parseArgs
+
+
+def submit(path, job):
+	"""sends a job to the server listening on the UNIX socket path, returns its reply"""
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+		s.connect(path)
+		with s.makefile("rwb") as f:
+			f.write(json.dumps(job).encode() + b"\n")
+			f.flush()
+			return json.loads(f.readline())
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Run Mitra on a server.", add_help=False)
+	parser.add_argument("--socket", required=True,
+		help="UNIX socket of the server.")
+	parser.add_argument("--send", default=False, action="store_true",
+		help="send the contents of file1 and file2 instead of their paths.")
+	client, argv = parser.parse_known_args()
+
+	job = {"argv": argv, "cwd": os.getcwd()}
+	if client.send:
+		# same arguments as mitra.py: checked here first
+		args = parseArgs("Mitra client", argv=argv)
+		for key, fn in [("data1", args.file1), ("data2", args.file2)]:
+			if fn is not None:
+				with open(fn, "rb") as f:
+					job[key] = base64.b64encode(f.read()).decode()
+
+	reply = submit(client.socket, job)
+	sys.stdout.write(reply["output"])
+	if "error" in reply:
+		print("Error: %s" % reply["error"], file=sys.stderr)
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -75,6 +75,44 @@ def inc8b(d, o, delta):
 	return d
 
 
+class Relocations(object):
+	"""journal of relocations: pointers to increment, applied all at once.
+
+	Recording is free; apply() patches a single bytearray in place
+	instead of rebuilding the whole data for each pointer."""
+
+	def __init__(self):
+		self.fixups = [] # (offset, struct format, delta)
+
+	def inc(self, o, delta, fmt):
+		assert fmt[0] in "<>"
+		self.fixups.append((o, fmt, delta))
+
+	def inc4l(self, o, delta):
+		self.inc(o, delta, "<I")
+
+	def inc4b(self, o, delta):
+		self.inc(o, delta, ">I")
+
+	def inc4(self, o, delta, e):
+		self.inc(o, delta, e[0] + "I")
+
+	def inc8l(self, o, delta):
+		self.inc(o, delta, "<Q")
+
+	def inc8b(self, o, delta):
+		self.inc(o, delta, ">Q")
+
+	def apply(self, d):
+		"""returns d as a bytearray (patched in place if it's already one)"""
+		if not isinstance(d, bytearray):
+			d = bytearray(d)
+		for o, fmt, delta in self.fixups:
+			v = struct.unpack_from(fmt, d, o)[0]
+			struct.pack_into(fmt, d, o, v + delta)
+		return d
+
+
 def int2b(i):
 	return int2(i, BIG)
 
@@ -1,254 +1,319 @@
 #!/usr/bin/env python3
 
-from parsers import *
-import random
+from parsers import blob, lazy, buildIndex, candidates
 import sys
-import hashlib
+import segments
+import cache
+import split
+import store
+import profiling
+from segments import Segments
 import os.path
+import io
+import re
+import contextlib
+import json
+import multiprocessing
 from args import *
 
 __version__ = "0.3" # https://semver.org/
 __date__ = "2023-03-25"
 __description__ = "Mitra v%s (%s) by Ange Albertini" % (__version__, __date__)
 
-PARSERS = [
+# parser modules are imported when a file matches their signature
+PARSERS = lazy([
 # magic at 0
-	arj, ar, bmp, bpg, cpio, cab, ebml, elf, flac, flv, gif, icc, ico, ilda, java,
-	jp2, jpg, lnk, id3v2, mp3, nes, ogg, pcap, pcapng, pe_sec, pe_hdr, png, psd, riff,
-	svg, tiff, wad, wasm, xz, zstd,
+	"arj", "ar", "bmp", "bpg", "cpio", "cab", "ebml", "elf", "flac", "flv", "gif", "icc", "ico", "ilda", "java",
+	"jp2", "jpg", "lnk", "id3v2", "mp3", "nes", "ogg", "pcap", "pcapng", "pe_sec", "pe_hdr", "png", "psd", "riff",
+	"svg", "tiff", "wad", "wasm", "xz", "zstd",
 
 # magic potentially further but checked at 0
-	_7z, mp4, pdf, gzip, bzip2, postscript, zip_, rar, rtf,
+	"_7z", "mp4", "pdf", "gzip", "bzip2", "postscript", "zip_", "rar", "rtf",
 
 # magic further
-	dcm, tar, pdfc, iso,
+	"dcm", "tar", "pdfc", "iso",
 
 # footer
-	id3v1,
-]
-
-# Global list to store generated files
-generated_files = []
-
-def randbuf(length):
-	res = b"\0" * length
-	res = bytes([random.randrange(255) for i in range(length)])
-	return res
+	"id3v1",
+])
 
+INDEX = buildIndex(PARSERS)
 
-def separatePayloads(fn, exts, data, swaps, overlap):
-	NoFile, SplitDir = getVars(["NOFILE", "SPLITDIR"])
+def separatePayloads(session, fn, exts, data, swaps, overlap):
+	NoFile, SplitDir = session.getVars(["NOFILE", "SPLITDIR"])
+	if NoFile:
+		return
 
 	ext1, ext2 = exts
-	p1 = b""
-	p2 = b""
-	start = 0
-	for end in swaps:
-		p1 += data[start:end]
-		p2 += randbuf(end-start)
+	seed = session.rng.getrandbits(64)
+	# the first payload keeps the data after the last swap
+	first = len(swaps) % 2
+	size = max(len(data), len(overlap))
+	with openFile(session, SplitDir, "%s.%s" % (fn, ext1), size) as f:
+		split.payload(data, swaps, first, seed, f)
+	with openFile(session, SplitDir, "%s.%s" % (fn, ext2), size) as f:
+		f.write(overlap)
+		split.payload(data, swaps, 1 - first, seed, f, len(overlap))
+	return
 
-		start = end
-		p1, p2 = p2, p1
-	p1 += data[end:]
-	p2 += randbuf(len(data)-end)
 
-	p2 = overlap + p2[len(overlap):]
+def openFile(session, dir, fn, size):
+	"""context of an output of a given size to write: to the session sink if any (archive), to dir otherwise"""
+	if session.sink is not None:
+		return session.sink.open(fn, size)
+	return store.create(session, os.path.join(dir, fn))
 
-	if not NoFile:
-		with open(os.path.join(SplitDir, "%s.%s" % (fn, ext1)), "wb") as f:
-				f.write(p1)
-		with open(os.path.join(SplitDir, "%s.%s" % (fn, ext2)), "wb") as f:
-				f.write(p2)
-	return
+
+def saveFile(session, dir, fn, data, digest=None):
+	"""writes an output to the session sink if any (archive), to dir otherwise"""
+	if session.sink is not None:
+		session.sink.add(fn, data)
+	else:
+		store.save(session, os.path.join(dir, fn), data, digest)
 
 
-def writeFile(name, exts, data, swaps=[], overlap=b""):
-	global generated_files
-	OutDir, NoFile, Split = getVars(["OUTDIR", "NOFILE", "SPLIT"])
+def writeFile(session, name, exts, data, swaps=[], overlap=b""):
+	OutDir, NoFile, Split = session.getVars(["OUTDIR", "NOFILE", "SPLIT"])
 
-	random.seed(0)
-	hash = hashlib.sha256(data).hexdigest()[:8].lower()
+	session.rng.seed(0)
+	with session.stage("hash", size=len(data)):
+		digest = segments.sha256(data).hexdigest()
+	hash = digest[:8].lower()
 
 	if Split and swaps != []:
-		separatePayloads(name, exts, data, swaps, overlap)
+		separatePayloads(session, name, exts, data, swaps, overlap)
 
 	fn = "%s.%s.%s" % (name, hash, ".".join(exts))
-	generated_files.append((fn, data))
+	session.output(fn, data, swaps, overlap)
 
 	if not NoFile:
-		with open(os.path.join(OutDir, "%s" % fn), "wb") as f:
-			f.write(data)
+		with session.stage("write", size=len(data)):
+			saveFile(session, OutDir, fn, data, digest)
 	return
 
 
-def isStackOk(ftype1, ftype2):
-	dprint("Stack: %s-%s" % (ftype1.TYPE, ftype2.TYPE))
+def isStackOk(ftype1, ftype2, session):
+	session.dprint("Stack: %s-%s" % (ftype1.TYPE, ftype2.TYPE))
 	result = True
 	if not ftype1.bAppData:
-		dprint("! File type 1 (%s) doesn't support appended data." % (ftype1.TYPE))
+		session.dprint("! File type 1 (%s) doesn't support appended data." % (ftype1.TYPE))
 		result = False
 
 	if ftype2.start_o == 0:
-		dprint("! File type 2 (%s) starts at offset 0 - it can't be appended." % (ftype2.TYPE))
+		session.dprint("! File type 2 (%s) starts at offset 0 - it can't be appended." % (ftype2.TYPE))
 		return False
 	else:
 		len1 = len(ftype1.data)
 		if len1 >= ftype2.start_o:
-			dprint("! File 1 is too big (0x%X). File 2 should start at offset 0x%X or less." % (len1, ftype2.start_o) )
+			session.dprint("! File 1 is too big (0x%X). File 2 should start at offset 0x%X or less." % (len1, ftype2.start_o) )
 			result = False
 
 	return result
 
 
-def isCavOk(ftype1, ftype2):
-	dprint("Cavity: %s_%s" % (ftype1.TYPE, ftype2.TYPE))
+def isCavOk(ftype1, ftype2, session):
+	session.dprint("Cavity: %s_%s" % (ftype1.TYPE, ftype2.TYPE))
 	filling = ftype1.data
 	filling_l = len(ftype1.data)
 
 	result = True
 	if not ftype1.bAppData:
-		dprint("! File type 1 (%s) doesn't support appended data." % (ftype1.TYPE))
+		session.dprint("! File type 1 (%s) doesn't support appended data." % (ftype1.TYPE))
 		result = False
 
 	if not ftype2.precav_s:
-		dprint("! File type 2 (%s) doesn't start with any cavity." % (ftype2.TYPE))
+		session.dprint("! File type 2 (%s) doesn't start with any cavity." % (ftype2.TYPE))
 		return False
 	elif filling_l > ftype2.precav_s:
-		dprint("! File 1 is too big (0x%X). File 2's cavity is only 0x%X." % (filling_l, ftype2.precav_s) )
+		session.dprint("! File 1 is too big (0x%X). File 2's cavity is only 0x%X." % (filling_l, ftype2.precav_s) )
 		result = False
 
 	return result
 
 
-def isParasiteOk(ftype1, ftype2):
-	dprint("Parasite: %s[%s]" % (ftype1.TYPE, ftype2.TYPE))
+def isParasiteOk(ftype1, ftype2, session):
+	session.dprint("Parasite: %s[%s]" % (ftype1.TYPE, ftype2.TYPE))
 	result = True
 	if not ftype1.bParasite:
-		dprint("! File type 1 (%s) doesn't support parasites." % (ftype1.TYPE))
+		session.dprint("! File type 1 (%s) doesn't support parasites." % (ftype1.TYPE))
 		return False
 
 	# start_o is 0 when precav_s isn't
 	if (ftype1.parasite_o > ftype2.start_o + ftype2.precav_s):
-		dprint("! File type 1 (%s) can only host parasites at offset 0x%X. File 2 should start at offset 0x%X or less." % (ftype1.TYPE, ftype1.parasite_o, ftype2.start_o) )
+		session.dprint("! File type 1 (%s) can only host parasites at offset 0x%X. File 2 should start at offset 0x%X or less." % (ftype1.TYPE, ftype1.parasite_o, ftype2.start_o) )
 		result = False
 
 	if ftype1.parasite_s < len(ftype2.data):
-		dprint("! File type 1 (%s) can accept parasites only of size 0x%X max. File 2 is too big (%X)." % (ftype1.TYPE, ftype1.parasite_s, len(ftype2.data)) )
+		session.dprint("! File type 1 (%s) can accept parasites only of size 0x%X max. File 2 is too big (%X)." % (ftype1.TYPE, ftype1.parasite_s, len(ftype2.data)) )
 		result = False
 
 	return result
 
 
-def isZipperOk(ftype1, ftype2):
-	dprint("Zipper: %s^%s" % (ftype1.TYPE, ftype2.TYPE))
+def isZipperOk(ftype1, ftype2, session):
+	session.dprint("Zipper: %s^%s" % (ftype1.TYPE, ftype2.TYPE))
 	result = True
 	if not ftype1.bZipper:
-		dprint("! File type 1 (%s) doesn't support zippers." % (ftype1.TYPE))
+		session.dprint("! File type 1 (%s) doesn't support zippers." % (ftype1.TYPE))
 		return False
 #  if not ftype1.bAppData:
-#    dprint("! File type 1 (%s) doesn't support appended data." % (ftype1.TYPE))
+#    session.dprint("! File type 1 (%s) doesn't support appended data." % (ftype1.TYPE))
 #    result = False
 
 	if not ftype1.bParasite:
-		dprint("! File type 1 (%s) doesn't support parasites." % (ftype1.TYPE))
+		session.dprint("! File type 1 (%s) doesn't support parasites." % (ftype1.TYPE))
 		return False
 
 	if not ftype2.bParasite:
-		dprint("! File type 2 (%s) doesn't support parasites." % (ftype2.TYPE))
+		session.dprint("! File type 2 (%s) doesn't support parasites." % (ftype2.TYPE))
 		return False
 
 	return result
 
 
-def Hit(type1, type2, results):
-	global VERBOSE
-	if getVar("VERBOSE"):
-		dprint("HIT " + ";".join(sorted([type1, type2])))
-
-
-def Stack(ftype1, ftype2, fn1, fn2, results):
-	if isStackOk(ftype1, ftype2):
+def Hit(type1, type2, results, session):
+	if session.getVar("VERBOSE"):
+		session.dprint("HIT " + ";".join(sorted([type1, type2])))
+
+
+# Alignment: outputs padded to a multiple of a block size,
+# for block cipher post-processing (16 for AES, 8 for Blowfish...).
+
+def getBlock(session):
+	Align, AesGcm = session.getVars(["ALIGN", "AESGCM"])
+	return Align or (16 if AesGcm else 0)
+
+
+def padLen(wrapper, size, block):
+	"""returns the length of the zero padding - longer than a block - that wrapper appends to align size, or None"""
+	first = block + 1
+	pad = first + (-(size + wrapper.wrappendLen(first))) % block
+	if (size + wrapper.wrappendLen(pad)) % block == 0:
+		return pad
+	# the wrapping overhead depends on the length
+	for pad in range(first, first + block):
+		if (size + wrapper.wrappendLen(pad)) % block == 0:
+			return pad
+	return None
+
+
+def alignLen(size, swaps, last, other, session):
+	"""returns the wrapper and the length of the padding aligning size, and the swaps with the padding.
+
+	last is the file ending the data. If the other file wraps appended data,
+	the padding is wrapped by it and belongs to it."""
+	block = getBlock(session)
+	if not block or size % block == 0:
+		return None, 0, swaps
+	wrapper = other if other.wrappendLen(0) != 0 else last
+	pad = padLen(wrapper, size, block)
+	if pad is None:
+		session.dprint("! Can't align to %i bytes." % block)
+		return None, 0, swaps
+	if wrapper is other:
+		swaps = swaps + [size]
+	return wrapper, pad, swaps
+
+
+def align(data, swaps, exts, last, other, session):
+	"""returns data padded to a multiple of the block size if set, with its swaps and extensions"""
+	wrapper, pad, swaps = alignLen(len(data), swaps, last, other, session)
+	if wrapper is None:
+		return data, swaps, exts
+	if wrapper is other:
+		exts = exts[::-1] # the padding ends the other file
+	return Segments([data, wrapper.wrappend(b"\0" * pad)]), swaps, exts
+
+
+def alignPlan(size, swaps, exts, last, other, session):
+	"""size-only align"""
+	wrapper, pad, swaps = alignLen(size, swaps, last, other, session)
+	if wrapper is None:
+		return size, swaps, exts
+	if wrapper is other:
+		exts = exts[::-1]
+	return size + wrapper.wrappendLen(pad), swaps, exts
+
+
+def Stack(ftype1, ftype2, fn1, fn2, results, session):
+	if isStackOk(ftype1, ftype2, session):
 		results.append(("Stack: concatenation of File1 (type %s) and File2 (type %s)" % (ftype1.TYPE, ftype2.TYPE)))
-		appData = ftype2.data
-		swap_o = len(ftype1.data + 
-			ftype1.wrappend(b""))
-
-		Hit(ftype1.TYPE, ftype2.TYPE, results)
+		swap_o = len(ftype1.data) + ftype1.wrappendLen(0)
+		# the wrapping overhead may depend on the length (LEB128 size...)
+		data_o = len(ftype1.data) + ftype1.wrappendLen(len(ftype2.data)) - len(ftype2.data)
+		appData = ftype2.relocate(ftype2.data, data_o)
+		stacked, swaps, exts = align(Segments([ftype1.data, ftype1.wrappend(appData)]), [swap_o],
+			[ext(fn2), ext(fn1)], ftype2, ftype1, session)
+
+		Hit(ftype1.TYPE, ftype2.TYPE, results, session)
 		writeFile(
+			session,
 			"S(%x)-%s-%s" % (swap_o, ftype1.TYPE, ftype2.TYPE),
-			[ext(fn2), ext(fn1)],
-			ftype1.data + 
-			ftype1.wrappend(appData),
-			[swap_o]
+			exts,
+			stacked,
+			swaps
 		)
 
 
-def Parasite(ftype1, ftype2, fn1, fn2, results):
-	if isParasiteOk(ftype1, ftype2):
+def Parasite(ftype1, ftype2, fn1, fn2, results, session):
+	if isParasiteOk(ftype1, ftype2, session):
 		results.append(("Parasite: hosting of File2 (type %s) in File1 (type %s)" % (
 			ftype2.TYPE, ftype1.TYPE)))
 		parasitized, swaps = ftype1.parasitize(ftype2)
 		if parasitized is None:
 			return
 
-		filealig = len(parasitized) % 16
-		if getVar("AESGCM") and filealig > 0:
-			wrap = ftype1
-			if len(ftype2.wrappend(b"")) != 0:
-				wrap = ftype2
-
-			for i in range(17, 32):
-				aligned = parasitized + wrap.wrappend(b"\0" * i)
-				if len(aligned) % 16 == 0:
-					break
-			if wrap == ftype2:
-				swaps += [len(parasitized)]
-			parasitized = aligned
+		parasitized, swaps, exts = align(parasitized, swaps, [ext(fn1), ext(fn2)], ftype1, ftype2, session)
 
 		swapstr = "(%s)" % "-".join("%x" % s for s in swaps) if swaps != [] else ""
-		Hit(ftype1.TYPE, ftype2.TYPE, results)
+		Hit(ftype1.TYPE, ftype2.TYPE, results, session)
 		writeFile(
+			session,
 			"P%s-%s[%s]" % (swapstr, ftype1.TYPE, ftype2.TYPE),
-			[ext(fn1), ext(fn2)],
+			exts,
 			parasitized,
 			swaps
 		)
 
 
-def Zipper(ftype1, ftype2, fn1, fn2, results):
-	if isZipperOk(ftype1, ftype2):
+def Zipper(ftype1, ftype2, fn1, fn2, results, session):
+	if isZipperOk(ftype1, ftype2, session):
 		zipper, swaps = ftype1.zipper(ftype2)
 		if (zipper, swaps) == (None, []):
 			return
 		results.append(("Zipper: interleaving of File1 (type %s) and File2 (type %s)" % (
 			ftype1.TYPE, ftype2.TYPE)))
+		zipper, swaps, exts = align(zipper, swaps, [ext(fn1), ext(fn2)], ftype1, ftype2, session)
 		swapstr = "(%s)" % "-".join("%x" % s for s in swaps) if swaps != [] else ""
-		Hit(ftype1.TYPE, ftype2.TYPE, results)
+		Hit(ftype1.TYPE, ftype2.TYPE, results, session)
 		writeFile(
+			session,
 			"Z%s-%s^%s" % (swapstr, ftype1.TYPE, ftype2.TYPE),
-			[ext(fn1), ext(fn2)],
+			exts,
 			zipper,
 			swaps
 		)
 
 
-def Cavity(ftype1, ftype2, fn1, fn2, results):
-	if isCavOk(ftype1, ftype2):
+def Cavity(ftype1, ftype2, fn1, fn2, results, session):
+	if isCavOk(ftype1, ftype2, session):
 		results.append(("Cavity: File1 (type %s) into File2 (type %s)" % (ftype1.TYPE, ftype2.TYPE)))
 		filling = ftype1.data
-		filling_l = len(filling + ftype1.wrappend(b""))
-		filled = filling + ftype1.wrappend(ftype2.data[filling_l:])
+		filling_l = len(filling) + ftype1.wrappendLen(0)
+		filled = Segments([filling, ftype1.wrappend(Segments([ftype2.data]).cut(filling_l))])
 		swap = filling_l
-		Hit(ftype1.TYPE, ftype2.TYPE, results)
+		filled, swaps, exts = align(filled, [swap], [ext(fn2), ext(fn1)], ftype2, ftype1, session)
+		Hit(ftype1.TYPE, ftype2.TYPE, results, session)
 		writeFile(
+			session,
 			"C(%x)-%s-%s" % (swap, ftype1.TYPE, ftype2.TYPE),
-			[ext(fn2), ext(fn1)],
+			exts,
 			filled,
-			[swap]
+			swaps
 		)
 
 
-def JpegOver5(jpeg, other, swaps, overlap):
+def JpegOver5(jpeg, other, swaps, overlap, session):
 	highnib = jpeg[4]
 	lownib = jpeg[5]
 	offset = 4 + 0x100*highnib + lownib
@@ -270,12 +335,12 @@ def JpegOver5(jpeg, other, swaps, overlap):
 		jpeg[offset:],
 		])
 
-	dprint("Jpeg overlap file: reducing one byte")
-	dprint("  (don't forget to postprocess after bruteforcing)")
+	session.dprint("Jpeg overlap file: reducing one byte")
+	session.dprint("  (don't forget to postprocess after bruteforcing)")
 	return jpeg, swaps, overlap
 
 
-def JpegOver4(jpeg, other, swaps, overlap):
+def JpegOver4(jpeg, other, swaps, overlap, session):
 	if not other.startswith(overlap) or len(swaps) != 2 or swaps[0] != 6 or len(overlap) != 6:
 		return jpeg, swaps, overlap
 
@@ -288,15 +353,15 @@ def JpegOver4(jpeg, other, swaps, overlap):
 		jpeg[6:],
 		])
 
-	dprint("Jpeg overlap file: reducing two bytes")
-	dprint("  (don't forget to postprocess after bruteforcing)")
+	session.dprint("Jpeg overlap file: reducing two bytes")
+	session.dprint("  (don't forget to postprocess after bruteforcing)")
 	return jpeg, swaps, overlap
 
 
-def Overlap(ftype1, ftype2, fn1, fn2, results, THRESHOLD=6):
-	dprint("Overlapping parasite")
+def Overlap(ftype1, ftype2, fn1, fn2, results, session, THRESHOLD=6):
+	session.dprint("Overlapping parasite")
 	if not ftype1.bParasite:
-		dprint("! Parasite not supported.", ftype1.TYPE)
+		session.dprint("! Parasite not supported.", ftype1.TYPE)
 		return False
 	ftype1.getCut()
 	overlap_l = ftype1.parasite_o
@@ -304,7 +369,7 @@ def Overlap(ftype1, ftype2, fn1, fn2, results, THRESHOLD=6):
 		results.append("! Error - overlap is None " + ftype1.TYPE)
 		return False
 	if overlap_l > THRESHOLD:
-		dprint("! Overlap (length:%i) too long (threshold:%i)." % (overlap_l, THRESHOLD))
+		session.dprint("! Overlap (length:%i) too long (threshold:%i)." % (overlap_l, THRESHOLD))
 		return False
 
 	fextra = blob.reader(ftype2.data[overlap_l:])
@@ -315,14 +380,16 @@ def Overlap(ftype1, ftype2, fn1, fn2, results, THRESHOLD=6):
 	overlap = ftype2.data[:overlap_l]
 
 	if ftype1.TYPE == "JPG":
-		parasitized, swaps, overlap = JpegOver4(parasitized, ftype2.data, swaps, overlap)
+		parasitized, swaps, overlap = JpegOver4(parasitized, ftype2.data, swaps, overlap, session)
+	parasitized, swaps, exts = align(parasitized, swaps, [ext(fn1), ext(fn2)], ftype1, fextra, session)
 
 	overlap_s = "".join("%02X" % c for c in overlap)
 	swapstr = "(%s)" % "-".join("%x" % s for s in swaps) if swaps != [] else ""
-	Hit(ftype1.TYPE, ftype2.TYPE, results)
+	Hit(ftype1.TYPE, ftype2.TYPE, results, session)
 	writeFile(
+		session,
 		"O%s-%s[%s]{%s}" % (swapstr, ftype1.TYPE, ftype2.TYPE, overlap_s),
-		[ext(fn1), ext(fn2)],
+		exts,
 		parasitized,
 		swaps=swaps,
 		overlap=overlap,	
@@ -331,7 +398,7 @@ def Overlap(ftype1, ftype2, fn1, fn2, results, THRESHOLD=6):
 	return True
 
 
-def OverlapPE(ftype1, ftype2, fn1, fn2, results):
+def OverlapPE(ftype1, ftype2, fn1, fn2, results, session):
 	SIG_l = 2
 	ELFANEW_o = 0x3c
 
@@ -339,18 +406,18 @@ def OverlapPE(ftype1, ftype2, fn1, fn2, results):
 		return False
 	overlap_l = SIG_l
 
-	dprint("PE Reverse overlapping parasite")
+	session.dprint("PE Reverse overlapping parasite")
 	if not ftype1.bParasite:
 		return False
 	if ftype1.parasite_o is None:
-		dprint("! Error - overlap is None", ftype1.TYPE)
+		session.dprint("! Error - overlap is None", ftype1.TYPE)
 		return False
 	cut = ftype1.getCut()
 	if ftype1.parasite_o > ELFANEW_o:
-		dprint("! Parasite offset too far: type (%s) parasite offset (0x%X)" % (ftype1.TYPE, ftype1.parasite_o))
+		session.dprint("! Parasite offset too far: type (%s) parasite offset (0x%X)" % (ftype1.TYPE, ftype1.parasite_o))
 		return False
 	if len(ftype2.data) > ftype1.parasite_s:
-		dprint("! PE file (size:%i) can't fit in parasite (max: %i)." % (len(ftype2.data), ftype1.parasite_s))
+		session.dprint("! PE file (size:%i) can't fit in parasite (max: %i)." % (len(ftype2.data), ftype1.parasite_s))
 		return False
 
 	fextra = blob.reader(ftype2.data[ftype1.parasite_o:])
@@ -360,12 +427,14 @@ def OverlapPE(ftype1, ftype2, fn1, fn2, results):
 		return False
 
 	overlap = ftype2.data[:overlap_l]
+	parasitized, swaps, exts = align(parasitized, swaps, [ext(fn1), ext(fn2)], ftype1, fextra, session)
 	overlap_s = "".join("%02X" % c for c in overlap)
 	swapstr = "(%s)" % "-".join("%x" % s for s in swaps) if swaps != [] else ""
-	Hit(ftype1.TYPE, ftype2.TYPE, results)
+	Hit(ftype1.TYPE, ftype2.TYPE, results, session)
 	writeFile(
+		session,
 		"OR%s-%s[%s]{%s}" % (swapstr, ftype1.TYPE, ftype2.TYPE, overlap_s),
-		[ext(fn1), ext(fn2)],
+		exts,
 		parasitized,
 		swaps=swaps,
 		overlap=overlap,
@@ -374,87 +443,425 @@ def OverlapPE(ftype1, ftype2, fn1, fn2, results):
 	return True
 
 
-def OverlapAll(ftype1, ftype2, fn1, fn2, results):
-	OverlapPE(ftype1, ftype2, fn1, fn2, results)
-	Overlap(ftype1, ftype2, fn1, fn2, results)
+def OverlapAll(ftype1, ftype2, fn1, fn2, results, session):
+	OverlapPE(ftype1, ftype2, fn1, fn2, results, session)
+	Overlap(ftype1, ftype2, fn1, fn2, results, session)
 
 
 ext = lambda s:os.path.splitext(s)[1]
 
 
-def DoAll(ftype1, ftype2, fn1, fn2, results):
-	Stack(ftype1, ftype2, fn1, fn2, results)
-	Parasite(ftype1, ftype2, fn1, fn2, results)
-	Zipper(ftype1, ftype2, fn1, fn2, results)
-	Cavity(ftype1, ftype2, fn1, fn2, results)
-	if getVar("OVERLAP"):
-		OverlapAll(ftype1, ftype2, fn1, fn2, results)
+# Planning: which layouts are possible, with their swaps and sizes,
+# without building any polyglot.
 
+def planName(name, exts):
+	"""file name of a planned polyglot - without its hash"""
+	return "%s.%s" % (name, ".".join(exts))
 
-def process_files(fn1, fdata1, fn2, fdata2):
-	global generated_files
-	generated_files = []
-	results = []
 
-	pad = getVar("PAD")
+def planStack(ftype1, ftype2, fn1, fn2, session):
+	if not isStackOk(ftype1, ftype2, session):
+		return None
+	swap_o = len(ftype1.data) + ftype1.wrappendLen(0)
+	size = len(ftype1.data) + ftype1.wrappendLen(len(ftype2.data))
+	size, swaps, exts = alignPlan(size, [swap_o], [ext(fn2), ext(fn1)], ftype2, ftype1, session)
+	name = "S(%x)-%s-%s" % (swap_o, ftype1.TYPE, ftype2.TYPE)
+	return planName(name, exts), swaps, size
+
+
+def planParasite(ftype1, ftype2, fn1, fn2, session):
+	if not isParasiteOk(ftype1, ftype2, session):
+		return None
+	size, swaps = ftype1.parasitizeLen(ftype2)
+	if size is None:
+		return None
+	size, swaps, exts = alignPlan(size, swaps, [ext(fn1), ext(fn2)], ftype1, ftype2, session)
+	swapstr = "(%s)" % "-".join("%x" % s for s in swaps) if swaps != [] else ""
+	name = "P%s-%s[%s]" % (swapstr, ftype1.TYPE, ftype2.TYPE)
+	return planName(name, exts), swaps, size
+
+
+def planZipper(ftype1, ftype2, fn1, fn2, session):
+	# zippers depend on both contents: only their feasibility is known
+	if not isZipperOk(ftype1, ftype2, session):
+		return None
+	name = "Z-%s^%s" % (ftype1.TYPE, ftype2.TYPE)
+	return planName(name, [ext(fn1), ext(fn2)]), None, None
+
+
+def planCavity(ftype1, ftype2, fn1, fn2, session):
+	if not isCavOk(ftype1, ftype2, session):
+		return None
+	filling_l = len(ftype1.data) + ftype1.wrappendLen(0)
+	size = len(ftype1.data) + ftype1.wrappendLen(max(0, len(ftype2.data) - filling_l))
+	size, swaps, exts = alignPlan(size, [filling_l], [ext(fn2), ext(fn1)], ftype2, ftype1, session)
+	name = "C(%x)-%s-%s" % (filling_l, ftype1.TYPE, ftype2.TYPE)
+	return planName(name, exts), swaps, size
+
+
+PLANNERS = [
+	["Stack", planStack],
+	["Parasite", planParasite],
+	["Zipper", planZipper],
+	["Cavity", planCavity],
+]
+
+
+def plan(ftype1, ftype2, fn1, fn2, session):
+	"""returns the possible layouts of this pair, with their swaps and output sizes.
+
+	Nothing is generated: sizes are computed from the lengths only.
+	Swaps and size are None when they depend on the contents (zippers)."""
+	plans = []
+	for layout, planner in PLANNERS:
+		planned = planner(*snapshots(ftype1, ftype2, session), fn1, fn2, session)
+		if planned is None:
+			continue
+		name, swaps, size = planned
+		plans.append({
+			"layout": layout,
+			"name": name,
+			"swaps": swaps,
+			"size": size,
+		})
+	return plans
+
+
+def getLayouts(session):
+	layouts = [Stack, Parasite, Zipper, Cavity]
+	if session.getVar("OVERLAP"):
+		layouts += [OverlapAll]
+	return layouts
+
+
+def DoAll(ftype1, ftype2, fn1, fn2, results, session):
+	for layout in getLayouts(session):
+		layout(*snapshots(ftype1, ftype2, session), fn1, fn2, results, session)
+
+
+def iterAll(ftype1, ftype2, fn1, fn2, results, session):
+	"""like DoAll, but yields the generated files after each layout"""
+	for layout in getLayouts(session):
+		with session.stage(layout.__name__, "layout", layout=layout.__name__):
+			layout(*snapshots(ftype1, ftype2, session), fn1, fn2, results, session)
+		yield from session.flush()
+
+
+def snapshots(ftype1, ftype2, session):
+	"""returns copies of the identified files for a single layout, cached and profiled as set by the session.
+
+	The identified files are never changed, so layouts can't affect each other."""
+	ftype1, ftype2 = ftype1.snapshot(), ftype2.snapshot()
+	cache.attach(session, ftype1, ftype2)
+	profiling.attach(session, ftype1, ftype2)
+	return ftype1, ftype2
+
+
+def padData(fdata, session):
+	pad = session.getVar("PAD")
 	if pad > 0:
-		fdata1 += b"\1" * (pad - len(fdata1))
-		fdata2 += b"\1" * (pad - len(fdata2))
+		fdata += b"\1" * (pad - len(fdata))
+	return fdata
 
-	ftype1 = None
-	ftype2 = None
 
-	for parser in PARSERS:
-		ftype = parser.parser
-		f = ftype(fdata1)
-		if f.identify():
-			ftype1 = f
-		f = ftype(fdata2)
+def identify_all(fdata):
+	"""returns the parser instances of all matching formats, in PARSERS order"""
+	ftypes = []
+	for parser in candidates(INDEX, fdata):
+		f = parser.parser(fdata)
 		if f.identify():
-			ftype2 = f
+			ftypes.append(f)
+	return ftypes
+
+
+def identify(fdata, session=None):
+	"""returns the parser instance of the last matching format, or None"""
+	if session is not None and session.memo is not None:
+		return session.memo.identify(fdata, identify)
+	with (contextlib.nullcontext() if session is None else session.stage("identify")):
+		ftypes = identify_all(fdata)
+	return ftypes[-1] if ftypes else None
+
+
+def process_files(fn1, fdata1, fn2, fdata2, session=None):
+	if session is None:
+		session = Session()
+	fdata1 = padData(fdata1, session)
+	fdata2 = padData(fdata2, session)
+
+	return process_types(fn1, identify(fdata1, session), fn2, identify(fdata2, session), fdata2, session)
+
+
+def iter_polyglots(fn1, fdata1, fn2, fdata2, session=None, results=None):
+	"""yields (name, data, swaps, overlap) of each polyglot as soon as it's generated.
+
+	Only one polyglot is held at a time: the caller decides what to keep."""
+	if session is None:
+		session = Session()
+	if results is None:
+		results = []
+	fdata1 = padData(fdata1, session)
+	fdata2 = padData(fdata2, session)
+
+	yield from iter_types(fn1, identify(fdata1, session), fn2, identify(fdata2, session), fdata2, session, results)
+
+
+def plan_files(fn1, fdata1, fn2, fdata2, session=None):
+	"""returns the plans of all the layouts of the files, in both orders if REVERSE"""
+	if session is None:
+		session = Session()
+	fdata1 = padData(fdata1, session)
+	fdata2 = padData(fdata2, session)
+	ftype1 = identify(fdata1, session)
+	ftype2 = identify(fdata2, session)
+	if ftype2 is None and session.getVar("FORCE"):
+		ftype2 = blob.reader(fdata2)
+	if ftype1 is None or ftype2 is None or ftype1.TYPE == ftype2.TYPE:
+		return []
+
+	plans = plan(ftype1, ftype2, fn1, fn2, session)
+	if session.getVar("REVERSE"):
+		plans += plan(ftype2, ftype1, fn2, fn1, session)
+	return plans
 
+
+def process_types(fn1, ftype1, fn2, ftype2, fdata2, session):
+	"""generates polyglots from already identified files (types can be None)"""
+	results = []
+	files = []
+	for fn, data, swaps, overlap in iter_types(fn1, ftype1, fn2, ftype2, fdata2, session, results):
+		files.append((fn, bytes(data)))
+	return results, files
+
+
+def iter_types(fn1, ftype1, fn2, ftype2, fdata2, session, results):
 	results.append(f"{fn1}")
 	if ftype1 is None:
 		results.append("ERROR: Unknown type file 1 - aborting.")
-		return results, []
+		return
 	results.append(f"File 1: {ftype1.DESC}")
 
 	results.append(f"{fn2}")
 	if ftype2 is None:
-		if getVar("FORCE"):
+		if session.getVar("FORCE"):
 			ftype2 = blob.reader(fdata2)
 		else:
 			results.append("ERROR: Unknown type file 2 (try -f ?) - aborting.")
-			return results, []
+			return
 
 	results.append(f"File 2: {ftype2.DESC}")
 	results.append("")
 
 	if ftype1.TYPE == ftype2.TYPE:
 		results.append("ERROR: Same file types - aborting.")
-		return results, []
+		return
+	if session.getVar("JOBS") > 1 and session.profiler is None:
+		yield from iterParallel(ftype1, ftype2, fn1, fn2, results, session)
+		return
+
+	yield from iterAll(ftype1, ftype2, fn1, fn2, results, session)
+	if session.getVar("REVERSE"):
+		session.dprint("REVERSE: Switching files order")
+		session.dprint("")
+		yield from iterAll(ftype2, ftype1, fn2, fn1, results, session)
+
+
+# Parallel layouts: the layouts of a pair (and of the reversed pair)
+# run in worker processes, and their outputs are merged in the sequential order.
+
+layout_pair = None
+layout_vars = None
 
-	DoAll(ftype1, ftype2, fn1, fn2, results)
-	if getVar("REVERSE"):
-		dprint("REVERSE: Switching files order")
-		dprint("")
-		DoAll(ftype2, ftype1, fn2, fn1, results)
+def initLayouts(pair, vars):
+	global layout_pair, layout_vars
+	layout_pair = pair
+	layout_vars = vars
 
-	return results, generated_files
+
+def layoutTask(task):
+	"""returns the generated files, the results and the printed output of a layout"""
+	index, reverse = task
+	(fn1, ftype1), (fn2, ftype2) = layout_pair[::-1] if reverse else layout_pair
+	session = Session(layout_vars)
+	if session.getVar("ARCHIVE"):
+		import archive
+		session.sink = archive.Collector()
+
+	results = []
+	printed = io.StringIO()
+	with contextlib.redirect_stdout(printed):
+		getLayouts(session)[index](*snapshots(ftype1, ftype2, session), fn1, fn2, results, session)
+	files = [(fn, bytes(data), swaps, overlap) for fn, data, swaps, overlap in session.flush()]
+	saved = session.sink.flush() if session.sink is not None else []
+	return files, saved, results, printed.getvalue()
+
+
+def iterParallel(ftype1, ftype2, fn1, fn2, results, session):
+	"""like iterAll - with the reversed pass if REVERSE - with layouts running in JOBS worker processes"""
+	count = len(getLayouts(session))
+	tasks = [(index, False) for index in range(count)]
+	if session.getVar("REVERSE"):
+		tasks += [(index, True) for index in range(count)]
+
+	sys.stdout.flush() # or the workers could inherit pending output
+	pair = ((fn1, ftype1), (fn2, ftype2))
+	with multiprocessing.Pool(min(session.getVar("JOBS"), len(tasks)), initLayouts, (pair, session.vars)) as pool:
+		for (index, reverse), (files, saved, lines, printed) in zip(tasks, pool.imap(layoutTask, tasks)):
+			if reverse and index == 0:
+				session.dprint("REVERSE: Switching files order")
+				session.dprint("")
+			sys.stdout.write(printed)
+			for fn, data in saved:
+				session.sink.add(fn, data)
+			results += lines
+			yield from files
+
+
+# Matrix mode: every file is read and identified once,
+# then each ordered pair is processed in a worker process.
+
+matrix_files = []
+matrix_vars = None
+
+def initMatrix(files, vars):
+	global matrix_files, matrix_vars
+	matrix_files = files
+	matrix_vars = vars
+
+
+def matrixPair(pair):
+	i, j = pair
+	fn1, fdata1, ftype1 = matrix_files[i]
+	fn2, fdata2, ftype2 = matrix_files[j]
+
+	session = Session(matrix_vars)
+	if session.getVar("ARCHIVE"):
+		import archive
+		session.sink = archive.Collector()
+	_, files = process_types(fn1, ftype1, fn2, ftype2, fdata2, session)
+	lines = []
+	for fn, data in files:
+		lines.append(json.dumps({
+			"file1": fn1,
+			"file2": fn2,
+			"type1": ftype1.TYPE,
+			"type2": ftype2.TYPE if ftype2 is not None else blob.reader.TYPE,
+			"layout": LAYOUTS[re.match("[A-Z]+", fn)[0]],
+			"name": fn,
+			"size": len(data),
+		}))
+	saved = session.sink.flush() if session.sink is not None else []
+	return lines, saved
+
+
+LAYOUTS = {
+	"S": "Stack",
+	"P": "Parasite",
+	"Z": "Zipper",
+	"C": "Cavity",
+	"O": "Overlap",
+	"OR": "OverlapPE",
+}
+
+
+def process_matrix(dir, jobs=None, session=None):
+	"""yields one JSON line per generated polyglot, for every ordered pair of files in dir"""
+	if session is None:
+		session = Session()
+	files = []
+	for fn in sorted(os.listdir(dir)):
+		fn = os.path.join(dir, fn)
+		if not os.path.isfile(fn):
+			continue
+		with open(fn, "rb") as f:
+			fdata = padData(f.read(), session)
+		files.append((fn, fdata, identify(fdata)))
+
+	pairs = [(i, j) for i in range(len(files)) for j in range(len(files)) if i != j]
+	vars = dict(session.vars, JOBS=1) # pairs are already processed in parallel
+	with multiprocessing.Pool(jobs, initMatrix, (files, vars)) as pool:
+		for lines, saved in pool.imap(matrixPair, pairs):
+			for fn, data in saved:
+				session.sink.add(fn, data)
+			yield from lines
+
+
+def sweep(fn1, fdata1, fn2, fdata2, combinations, session):
+	"""generates with every combination of (options, vars), identifying and normalizing each input once.
+
+	Prints and returns the records of the outputs, with the options producing them."""
+	if session.memo is None:
+		session.memo = cache.Memory()
+	records = []
+	for options, vars in combinations:
+		combination = Session(dict(session.vars, **vars))
+		combination.memo, combination.sink = session.memo, session.sink
+		for fn, data, swaps, overlap in iter_polyglots(fn1, fdata1, fn2, fdata2, combination):
+			record = {"options": options, "name": fn, "size": len(data), "swaps": swaps, "overlap": overlap.hex()}
+			print(json.dumps(record))
+			records.append(record)
+	return records
 
 
 def main():
 	args = Setup(__description__)
-	fn1,fn2 = args.file1, args.file2
-	with open(fn1, "rb") as f:
-		fdata1 = f.read()
-	with open(fn2, "rb") as f:
-		fdata2 = f.read()
-
 	# The Setup function is called first to configure the application
-	results, files = process_files(fn1, fdata1, fn2, fdata2)
+	if args.serve is not None:
+		import server
+		server.serve(args.serve)
+		return
+	session = Session()
+	if args.archive:
+		import archive # tarfile and zipfile: only imported if needed
+		session.sink = archive.create(args.archive)
+	try:
+		run(args, session)
+	finally:
+		if session.sink is not None:
+			session.sink.close()
+
+
+def run(args, session, fdata1=None, fdata2=None):
+	"""runs the command line args, on the given input contents if any - instead of reading the files.
+
+	Returns the records of the outputs: polyglots, plans or matrix lines."""
+	if args.matrix is not None:
+		records = []
+		for line in process_matrix(args.matrix, args.jobs, session):
+			print(line, flush=True)
+			records.append(json.loads(line))
+		return records
+
+	fn1,fn2 = args.file1, args.file2
+	if fdata1 is None:
+		fdata1 = segments.load(fn1, args.mmap)
+	if fdata2 is None:
+		fdata2 = segments.load(fn2, args.mmap)
+
+	if args.sweep:
+		return sweep(fn1, fdata1, fn2, fdata2, args.sweep, session)
+
+	if args.plan:
+		plans = list(plan_files(fn1, fdata1, fn2, fdata2, session))
+		for p in plans:
+			print(json.dumps(p))
+		return plans
+
+	if args.profile:
+		session.profiler = profiling.Profiler()
+	results = []
+	records = []
+	try:
+		for fn, data, swaps, overlap in iter_polyglots(fn1, fdata1, fn2, fdata2, session, results):
+			records.append({"name": fn, "size": len(data), "swaps": swaps, "overlap": overlap.hex()})
+	finally:
+		if args.profile:
+			session.profiler.stop()
 	for r in results:
 		print(r)
+	if args.profile:
+		session.profiler.save(args.profile)
+	return records
 
 if __name__ == "__main__":
 	main()
\ No newline at end of file
@@ -6,24 +6,26 @@
 # Ange Albertini MIT 2022
 
 
-from parsers import *
+from parsers import blob, lazy, buildIndex, candidates
 import argparse
 import os.path
 from sigs import *
 
 
-PARSERS = [
+PARSERS = lazy([
 # magic at 0
-  arj, ar, bmp, bpg, cpio, cab, ebml, elf, flac, flv, gif, icc, ico, ilda, java,
-  jp2, jpg, lnk, id3v2, nes, ogg, pcap, pcapng, pe_sec, pe_hdr, png, psd, riff,
-  svg, tiff, wad, wasm, xz, zstd,
+  "arj", "ar", "bmp", "bpg", "cpio", "cab", "ebml", "elf", "flac", "flv", "gif", "icc", "ico", "ilda", "java",
+  "jp2", "jpg", "lnk", "id3v2", "nes", "ogg", "pcap", "pcapng", "pe_sec", "pe_hdr", "png", "psd", "riff",
+  "svg", "tiff", "wad", "wasm", "xz", "zstd",
 
 # magic potentially further but checked at 0
-  _7z, mp4, pdf, gzip, bzip2, postscript, zip_, rar, rtf,
+  "_7z", "mp4", "pdf", "gzip", "bzip2", "postscript", "zip_", "rar", "rtf",
 
 # magic further
-  dcm, tar, pdfc, iso,
-]
+  "dcm", "tar", "pdfc", "iso",
+])
+
+INDEX = buildIndex(PARSERS)
 
 
 def main():
@@ -55,7 +57,7 @@ def main():
     fdata = f.read()
 
   ftype = None
-  for parser in PARSERS:
+  for parser in candidates(INDEX, fdata):
     f = parser.parser(fdata)
     if f.identify():
       ftype = f
@@ -94,7 +96,7 @@ def main():
         parasitized, _ = ftype.parasitize(blob.reader(parasite))
 
         if parasitized is not None:
-          fdata = parasitized
+          fdata = bytes(parasitized)
           print("Parasite-combined sig(s):", " / ".join(sigsp))
     fdata = fixtarsum(fdata)
     fn = "mA-%s" % (os.path.basename(args.file))
@@ -148,7 +150,7 @@ def main():
       if parasitized is None:
         print("ERROR: Parasitizing failure.")
         return
-      parasitized = fixtarsum(parasitized)
+      parasitized = fixtarsum(bytes(parasitized))
 
       fn = "mP-%s.%s" % (os.path.basename(args.file), mock)
       fn = os.path.join(outdir, fn)
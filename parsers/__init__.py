@@ -1,5 +1,10 @@
 #!/usr/bin/env python3
 
+import copy
+import importlib
+
+from segments import Segments, view
+
 __all__ = [
 # containers
 	"ebml",         # Extensible Binary Meta Language: Matroska, WebM...
@@ -37,9 +42,144 @@ __all__ = [
 ]
 
 
+# Dispatch index: maps declared signatures to parsers,
+# so that only the parsers whose signature matches get to identify a file.
+
+KEY_s = 2 # length of the magic prefix used as a key
+
+
+def getSigs(ftype):
+	"""returns the declared signatures [(offset, magic)] of a parser class, or None"""
+	if hasattr(ftype, "MAGICS"):
+		return [(ftype.MAGIC_o, magic) for magic in ftype.MAGICS]
+	if hasattr(ftype, "MAGIC"):
+		return [(ftype.MAGIC_o, ftype.MAGIC)]
+	return None
+
+
+def moduleSigs(parser):
+	"""returns the declared signatures of a parser module - without importing it if lazy"""
+	if isinstance(parser, Lazy):
+		return SIGNATURES[parser.name]
+	return getSigs(parser.parser)
+
+
+def buildIndex(parsers):
+	"""builds a dispatch index from the parsers' MAGIC / MAGIC_o / MAGICS"""
+	offsets = {}
+	generic = [] # no declared signature: always a candidate
+	for rank, parser in enumerate(parsers):
+		sigs = moduleSigs(parser)
+		if sigs is None:
+			generic.append(rank)
+			continue
+		for offset, magic in sigs:
+			assert len(magic) >= KEY_s
+			keys = offsets.setdefault(offset, {})
+			keys.setdefault(magic[:KEY_s], []).append((rank, magic))
+	return parsers, offsets, generic
+
+
+def candidates(index, data):
+	"""returns the parsers whose signature matches the data, in the parsers order"""
+	parsers, offsets, generic = index
+	ranks = set(generic)
+	for offset, keys in offsets.items():
+		if offset < 0:
+			offset = max(0, len(data) + offset)
+		for rank, magic in keys.get(data[offset:offset + KEY_s], []):
+			if data.startswith(magic, offset):
+				ranks.add(rank)
+	return [parsers[rank] for rank in sorted(ranks)]
+
+
+# Lazy registry: parser modules are only imported when a file matches their signature,
+# or when they're used. Their declared signatures are copied here,
+# and checked against the parser when it's imported.
+
+SIGNATURES = {
+	"arj":        [(0, b"\x60\xEA")],
+	"ar":         [(0, b"!<arch>\n")],
+	"bmp":        [(0, b"BM")],
+	"bpg":        [(0, b"BPG\xFB")],
+	"cpio":       [(0, b"\xC7\x71")],
+	"cab":        [(0, b"MSCF")],
+	"ebml":       [(0, b"\x1A\x45\xDF\xA3")],
+	"elf":        [(0, b"\x7FELF")],
+	"flac":       [(0, b"fLaC")],
+	"flv":        [(0, b"FLV\x01")],
+	"gif":        [(0, b"GIF87a"), (0, b"GIF89a")],
+	"icc":        [(36, b"acsp")],
+	"ico":        [(0, b"\0\0\1\0")],
+	"ilda":       [(0, b"ILDA")],
+	"java":       [(0, b"\xCA\xFE\xBA\xBE")],
+	"jp2":        [(0, b"\0\0\0\x0CjP  ")],
+	"jpg":        [(0, b"\xFF\xD8")],
+	"lnk":        [(0, b"L\0\0\0\x01\x14\x02\0\0\0\0\0\xC0\0\0\0\0\0\0F")],
+	"id3v2":      [(0, b"ID3\x03\0")],
+	"mp3":        None,
+	"nes":        [(0, b"NES\x1A")],
+	"ogg":        [(0, b"OggS")],
+	"pcap":       [(0, b"\xD4\xC3\xB2\xA1")],
+	"pcapng":     [(0, b"\n\r\r\n")],
+	"pe_sec":     [(0, b"MZ")],
+	"pe_hdr":     [(0, b"MZ")],
+	"png":        [(0, b"\x89PNG\r\n\x1A\n")],
+	"psd":        [(0, b"8BPS")],
+	"riff":       [(0, b"RIFF"), (0, b"RIFX")],
+	"svg":        [(0, b"<svg ")],
+	"tiff":       [(0, b"MM\0*"), (0, b"II*\0")],
+	"wad":        [(0, b"IWAD"), (0, b"PWAD")],
+	"wasm":       [(0, b"\0asm\1\0\0\0")],
+	"xz":         [(0, b"\xFD7zXZ\0")],
+	"zstd":       [(0, b"\x04\x22\x4D\x18"), (0, b"\x02\x21\x4C\x18")]
+		+ [(0, bytes([frame]) + b"\x2A\x4D\x18") for frame in range(0x50, 0x60)]
+		+ [(0, b"\x28\xB5\x2F\xFD")],
+	"_7z":        [(0, b"7z\xBC\xAF\x27\x1C")],
+	"mp4":        [(4, b"ftyp")],
+	"pdf":        [(0, b"%PDF-1")],
+	"gzip":       [(0, b"\x1F\x8B")],
+	"bzip2":      [(0, b"BZh")],
+	"postscript": [(0, b"%!PS")],
+	"zip_":       [(0, b"PK\x03\x04")],
+	"rar":        [(0, b"Rar!\x1A\x07\0"), (0, b"Rar!\x1A\x07\x01\0")],
+	"rtf":        [(0, b"{\\rtf1")],
+	"dcm":        [(128, b"DICM")],
+	"tar":        [(256, b"\0ustar")],
+	"pdfc":       [(1018, b"%PDF-1")],
+	"iso":        [(32768, b"\x01CD001\x01")],
+	"id3v1":      [(-128, b"TAG")],
+}
+
+
+class Lazy(object):
+	"""parser module imported on first use"""
+
+	def __init__(self, name):
+		self.name = name
+		self.__name__ = "parsers." + name
+		self._module = None
+
+	def __getattr__(self, attr):
+		if self.__dict__.get("_module") is None:
+			self._module = importlib.import_module(self.__name__)
+			assert getSigs(self._module.parser) == SIGNATURES[self.name], "outdated signatures of %s" % self.name
+		return getattr(self._module, attr)
+
+	def __repr__(self):
+		return "<lazy parser %s>" % self.name
+
+
+def lazy(names):
+	"""returns the parser modules of names, imported on first use"""
+	return [Lazy(name) for name in names]
+
+
 class FType(object):
 	DESC = "Short name / Full name"
 	TYPE = "Extension"
+	MAGIC_o = 0             # offset of MAGIC (or of each of MAGICS), negative from the end
+	HEADER_s = None         # if set, relocations only patch that many first bytes, via fixheader
 
 	def __init__(self, data=""):
 		self.data = data
@@ -69,9 +209,31 @@ class FType(object):
 		return self.data.startswith(self.MAGIC)
 
 
+	def snapshot(self):
+		"""returns a copy to generate from, leaving this identified file untouched.
+
+		Generating updates the parser state (normalize, getCut...) by replacing
+		attributes, never by changing them in place: the data is shared."""
+		return copy.copy(self)
+
+
 	def fixformat(self, data, delta=0):
 		"""fixes the format data to be valid at a different offset"""
-		return data # most format don't need relocations
+		if self.HEADER_s is None:
+			return data # most format don't need relocations
+		# only the header is patched: the rest of the data is not copied
+		head = self.fixheader(bytearray(data[:self.HEADER_s]), len(data), delta)
+		return Segments([head, Segments([data]).cut(self.HEADER_s)])
+
+
+	def relocate(self, data, offset):
+		"""fixes the format data to be valid at offset in the file - when placed after another one"""
+		return data # offsets relative to the start of the format, if any
+
+
+	def fixheader(self, head, size, delta):
+		"""fixformat of the HEADER_s first bytes (bytearray) of fixed data of a given size"""
+		return head
 
 
 	def wrap(self, data):
@@ -79,6 +241,11 @@ class FType(object):
 		return data
 
 
+	def wrapLen(self, parasite_s):
+		"""size-only wrap: returns the size of a wrapped parasite of size parasite_s"""
+		return len(self.wrap(b"")) + parasite_s
+
+
 	def getCut(self):
 		"""return cut offset according to actual file data"""
 		return self.cut
@@ -94,6 +261,16 @@ class FType(object):
 		return parasite
 
 
+	def fixparasiteLen(self, parasite_s):
+		"""size-only fixparasite"""
+		return parasite_s
+
+
+	def fixformatLen(self, size, delta):
+		"""size-only fixformat: returns the size of the fixed data"""
+		return size
+
+
 	def normalize(self):
 		"""normalize the host data for easier patching"""
 		return
@@ -104,6 +281,11 @@ class FType(object):
 		return data
 
 
+	def wrappendLen(self, data_s):
+		"""size-only wrappend"""
+		return len(self.wrappend(b"")) + data_s
+
+
 	def wrapparasite(self, fparasite, d, cut):
 		# handle wrappending in parasite format
 		deltaw0 = len(fparasite.wrappend(b""))
@@ -119,6 +301,15 @@ class FType(object):
 		return d
 
 
+	def wrapparasiteLen(self, fparasite, d_s, cut):
+		"""size-only wrapparasite"""
+		deltaw0 = fparasite.wrappendLen(0)
+		if deltaw0 != 0:
+			wrappended_s = self.postwrap + len(self.data) - cut
+			d_s += fparasite.wrappendLen(wrappended_s) - wrappended_s
+		return d_s
+
+
 	def cutparasite(self, fparasite, d, cut):
     # handle pre-cavity in parasite format
 		prewrap_s = self.getPrewrap(len(d))
@@ -132,6 +323,16 @@ class FType(object):
 		return prewrap_s, d
 
 
+	def cutparasiteLen(self, fparasite, d_s, cut):
+		"""size-only cutparasite"""
+		prewrap_s = self.getPrewrap(d_s)
+		if fparasite.precav_s > 0:
+			d_s = max(0, d_s - (cut + prewrap_s))
+			if self.getPrewrap(d_s) != prewrap_s:
+				return None, 0
+		return prewrap_s, d_s
+
+
 	def parasitize(self, fparasite):
 		self.normalize()
 		host = self.data
@@ -157,12 +358,47 @@ class FType(object):
 			cut + delta - self.postwrap,
 		]
 
-		merged = self.data[:cut] + wrapped + self.data[cut:]
-
-		merged = self.fixformat(merged, delta)
+		host = Segments([self.data])
+		merged = Segments([host.cut(0, cut), wrapped, host.cut(cut)])
+		if self.HEADER_s is not None:
+			# only the header is patched, even if fixformat is specific
+			merged = FType.fixformat(self, merged, delta)
+		elif type(self).fixformat is not FType.fixformat:
+			# a single copy that relocations can patch in place
+			merged = bytearray().join(map(view, merged.parts))
+			merged = self.fixformat(merged, delta)
 
 		return merged, swaps
 
 
+	def parasitizeLen(self, fparasite):
+		"""size-only parasitize: returns the merged size and the swaps without building the data.
+
+		Content checks done while wrapping (PostScript) are not performed."""
+		if type(self).parasitize is not FType.parasitize:
+			# specific strategy: only known by building it
+			merged, swaps = self.parasitize(fparasite)
+			return (None if merged is None else len(merged)), swaps
+
+		self.normalize()
+		parasite_s = self.fixparasiteLen(len(fparasite.data))
+		if parasite_s > self.parasite_s:
+			return None, []
+
+		cut = self.getCut()
+
+		parasite_s = self.wrapparasiteLen(fparasite, parasite_s, cut)
+		prewrap_s, parasite_s = self.cutparasiteLen(fparasite, parasite_s, cut)
+		if prewrap_s is None:
+			return None, []
+
+		delta = self.wrapLen(parasite_s)
+		swaps = [
+			cut + prewrap_s,
+			cut + delta - self.postwrap,
+		]
+		return self.fixformatLen(len(self.data) + delta, delta), swaps
+
+
 	def zipper(self, fhost):
 		return None, []
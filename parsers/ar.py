@@ -53,5 +53,11 @@ class parser(FType):
 		hdr = self.makeHdr(b"#1/0", size=l)
 		return hdr + data
 
+	def wrapLen(self, parasite_s):
+		return self.hdr_s + parasite_s + parasite_s % 2
+
 	def wrappend(self, data):
 		return self.wrap(data)
+
+	def wrappendLen(self, data_s):
+		return self.wrapLen(data_s)
@@ -76,6 +76,13 @@ class parser(FType):
 		return wrapped
 
 
+	def wrapLen(self, parasite_s):
+		tag_len_l = len(ue7_enc(parasite_s))
+		tag_l = len(ue7_enc(1))
+		ext_l = tag_len_l + tag_l + parasite_s
+		return len(ue7_enc(ext_l)) + ext_l
+
+
 	def fixformat(self, d, delta):
 		flags = d[self.FLAGS_o]
 		flags |= 8
@@ -118,9 +125,7 @@ class parser(FType):
 
 
 	def getPrewrap(self, parasite_s):
-		parasite__ = b"\0" * parasite_s
-		wrapped = self.wrap(parasite__)
-		delta = len(wrapped) - parasite_s
+		delta = self.wrapLen(parasite_s) - parasite_s
 		assert delta >= self.prewrap
 
 		self.prewrap = delta
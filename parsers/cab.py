@@ -66,12 +66,13 @@ class parser(FType):
 
 
 	def fixformat(self, d, delta):
-		d = inc4l(d, self.cbCabinet_o, delta)
-		d = inc4l(d, self.coffFiles_o, delta)
+		relocs = Relocations()
+		relocs.inc4l(self.cbCabinet_o, delta)
+		relocs.inc4l(self.coffFiles_o, delta)
 
 		o = self.CFHEADER_s
 		for i in range(self.cFolders):
- 			d = inc4l(d, o + self.coffCabStart_o, delta)
+ 			relocs.inc4l(o + self.coffCabStart_o, delta)
  			o += self.CFFOLDER_s
 
-		return d
+		return relocs.apply(d)
@@ -69,5 +69,9 @@ class parser(FType):
 		return d
 
 
+	def fixformatLen(self, size, delta):
+		return size + -size % 512
+
+
 	def wrap(self, data):
 		return self.makeHdr(b"", data)
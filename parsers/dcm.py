@@ -9,6 +9,7 @@ class parser(FType):
 	DESC = "DICOM / Digital Imaging and Communications in Medicine"
 	TYPE = "DCM"
 	MAGIC = b"DICM"
+	MAGIC_o = 0x80
 
 	def __init__(self, data=""):
 		FType.__init__(self, data)
@@ -29,7 +30,7 @@ class parser(FType):
 
 
 	def identify(self):
-		return self.data[0x80:].startswith(self.MAGIC)
+		return self.data[self.MAGIC_o:].startswith(self.MAGIC)
 
 
 	def wrap(self, parasite):
@@ -120,7 +121,7 @@ class parser(FType):
 			print("> DICOM body too big to fit in %s parasite." % zero.TYPE)
 			return None, []
 
-		nheadwrap = zero.wrap(nhead)
+		nheadwrap = bytes(zero.wrap(nhead)) # wrap may return Segments
 		delta = len(nheadwrap)
 
 		zipdata = b"".join([
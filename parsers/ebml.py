@@ -88,6 +88,7 @@ class parser(FType):
 		self.bParasite = True
 
 		self.cut = self.ebml_o + self.ebml_s
+		self.HEADER_s = self.cut # relocations only patch the EBML size
 		self.prewrap = self.void_s + self.ebml_s # VoidId:1, VarInt:self.ebml_s
 		self.postwrap = 0
 		self.parasite_o = self.cut + self.prewrap
@@ -99,6 +100,8 @@ class parser(FType):
 		d = self.data
 		
 		i, size_l = VarIntToInt(d[self.ebml_o:])
+		if size_l == self.ebml_s:
+			return
 		parasite_o = self.ebml_o + size_l
 		self.data = self.data[:self.ebml_o] + IntToVarInt(i, self.ebml_s) + self.data[parasite_o:]
 
@@ -108,9 +111,9 @@ class parser(FType):
 		return VOID + IntToVarInt(len(data), self.ebml_s) + data
 
 
-	def fixformat(self, d, delta):
-		i, s = VarIntToInt(d[self.ebml_o:])
+	def fixheader(self, head, size, delta):
+		i, s = VarIntToInt(head[self.ebml_o:])
 		assert s == self.ebml_s
 		i += delta
-		d = d[:self.ebml_o] + IntToVarInt(i, s) + d[self.ebml_o + s:]
-		return d
+		head[self.ebml_o:self.ebml_o + s] = IntToVarInt(i, s)
+		return head
@@ -59,20 +59,21 @@ class parser(FType):
 
 
 	def fixformat(self, d, delta):
+		relocs = Relocations()
 		# update e_shoff in File Header
-		d = inc4l(d,0x20, delta) if self.bits == 32 else inc8l(d, 0x28, delta)
+		relocs.inc4l(0x20, delta) if self.bits == 32 else relocs.inc8l(0x28, delta)
 
 		# fix Program header table - actually not required ?
 		# o = self.ph_o
 		# for i in range(self.ph_c):
-		# 	d = inc4l(d, o+0x4, delta) if self.bits == 32 else inc8l(d, o+0x8, delta)
+		# 	relocs.inc4l(o+0x4, delta) if self.bits == 32 else relocs.inc8l(o+0x8, delta)
 		# 	o += self.ph_s
 
 		# fix section header table
 		o = self.sh_o + delta # it has been moved down
 		o += self.sh_s        # skip first entry
 		for i in range(self.sh_c - 1): 
-			d = inc4l(d, o+0x10, delta) if self.bits == 32 else inc8l(d, o+0x18, delta)
+			relocs.inc4l(o+0x10, delta) if self.bits == 32 else relocs.inc8l(o+0x18, delta)
 			o += self.sh_s
 
-		return d
+		return relocs.apply(d)
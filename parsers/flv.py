@@ -12,6 +12,7 @@ class parser(FType):
 	DESC = "FLV / Flash Video"
 	TYPE = "FLV"
 	MAGIC = b"FLV\1"
+	HEADER_s = 9
 
 	def __init__(self, data=""):
 		FType.__init__(self, data)
@@ -23,7 +24,6 @@ class parser(FType):
 		self.cut = 9
 
 
-	def fixformat(self, d, delta):
+	def fixheader(self, head, size, delta):
 		pointer_o = 5
-		d = inc4b(d, pointer_o, delta)
-		return d
\ No newline at end of file
+		return inc4b(head, pointer_o, delta)
\ No newline at end of file
@@ -14,6 +14,7 @@ def readFlags(ll, f):
 class parser(FType):
 	DESC = "GIF / Graphics Interchange Format"
 	TYPE = "GIF"
+	MAGICS = [b"GIF87a", b"GIF89a"]
 	SUBBLOCK_MAX = 255 # max size of a subblock chunk
 
 	def __init__(self, data=""):
@@ -32,8 +33,7 @@ class parser(FType):
 	def identify(self):
 		# in theory, only GIF 89 support comments
 		# but in practice, it's irrelevant
-		return self.data.startswith(b"GIF87a") or \
-			self.data.startswith(b"GIF89a")
+		return self.data.startswith(tuple(self.MAGICS))
 
 
 	def wrap(self, parasite):
@@ -50,6 +50,11 @@ class parser(FType):
 		chunked += bytes([0]) # terminator
 		return b"!" + b"\xfe" + chunked
 
+
+	def wrapLen(self, parasite_s):
+		chunks = -(-parasite_s // self.SUBBLOCK_MAX)
+		return 2 + chunks + parasite_s + 1
+
 	def getCut(self):
 		host = self.data
 
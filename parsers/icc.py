@@ -14,6 +14,7 @@ class parser(FType):
 
 	sig_o = 0x24
 	sig_s = 4
+	MAGIC_o = sig_o
 
 	tagcount_o = 0x80
 	tagcount_s = 4
@@ -53,10 +54,12 @@ class parser(FType):
 		fdelta = delta + 3*4 # we need a new tag table entry
 
 		# adjust tag table
+		relocs = Relocations()
 		ptr = self.tagcount_o + self.tagcount_s + 4*1
 		for i in range(self.tagcount):
-			d = inc4b(d, ptr, fdelta)
+			relocs.inc4b(ptr, fdelta)
 			ptr += 3*4
+		d = relocs.apply(d)
 
 		self.tagcount += 1
 		self.size += fdelta
@@ -75,3 +78,7 @@ class parser(FType):
 			])
 
 		return d
+
+
+	def fixformatLen(self, size, delta):
+		return size + 3*4 # new tag table entry
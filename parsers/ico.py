@@ -12,6 +12,7 @@ from helpers import *
 class parser(FType):
 	DESC = "ICO / Windows icon"
 	TYPE = "ICO"
+	MAGIC = b"\0\0\1\0" # what a shitty lack of magic
 
 	def __init__(self, data=""):
 		FType.__init__(self, data)
@@ -23,7 +24,7 @@ class parser(FType):
 
 
 	def identify(self):
-		if not self.data.startswith(b"\0\0\1\0"): # what a shitty lack of magic
+		if not self.data.startswith(self.MAGIC):
 			return False
 
 		self.count = get2l(self.data, 4)
@@ -36,9 +37,10 @@ class parser(FType):
 
 
 	def fixformat(self, d, delta):
+		relocs = Relocations()
 		offset = 6 + 0x0c
 		for i in range(self.count):
-			d = inc4l(d, offset, delta)
+			relocs.inc4l(offset, delta)
 
 			offset += 0x10
-		return d
+		return relocs.apply(d)
@@ -9,6 +9,7 @@ class parser(FType):
 	DESC = "ID3v1 [Tag]"
 	TYPE = "ID3v1"
 	MAGIC = b"TAG"
+	MAGIC_o = -128 # footer
 
 	def __init__(self, data=""):
 		FType.__init__(self, data)
@@ -32,6 +32,10 @@ class parser(FType):
 		return parasite
 
 
+	def fixparasiteLen(self, parasite_s):
+		return parasite_s + -parasite_s % 3
+
+
 	def wrap(self, data):
 		RecNb = int2b(len(data) // 3)
 		wrapped = b"".join([
@@ -5,6 +5,8 @@ from parsers import FType
 class parser(FType):
 	DESC = "ISO 9660 image [dump]"
 	TYPE = "ISO"
+	MAGIC = b"\1CD001\1"
+	MAGIC_o = 0x8000
 
 	def __init__(self, data=""):
 		FType.__init__(self, data)
@@ -16,4 +18,4 @@ class parser(FType):
 
 
 	def identify(self):
-		return self.data[0x8000:].startswith(b"\1CD001\1")
+		return self.data[self.MAGIC_o:].startswith(self.MAGIC)
@@ -17,6 +17,8 @@ class parser(FType):
 	DESC = "MP4 / Iso Base Media Format [container]"
 	TYPE = "MP4"
 	ATOM = b"ftyp"
+	MAGIC = ATOM
+	MAGIC_o = 4
 
 	def __init__(self, data=""):
 		FType.__init__(self, data)
@@ -45,6 +47,12 @@ class parser(FType):
 		return struct.pack(">I", len(data) + 8) + b"free" + data
 
 
+	def normalize(self):
+		if self.data.find(b"stco") == -1:
+			# no Chunk Offsets tables: nothing to relocate
+			self.HEADER_s = 0
+
+
 	def fixformat(self, d, delta):
 		# finds and relocates all Sample Tables Chunk Offset tables
 		# TODO: support 64 bits `co64` tables
@@ -46,3 +46,7 @@ class parser(FType):
 		# need to pad parasite to 512
 		parasite += bytes([0]) * (512-len(parasite))
 		return parasite
+
+
+	def fixparasiteLen(self, parasite_s):
+		return max(parasite_s, 512)
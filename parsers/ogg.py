@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 
+import random
+import binascii
+
 from parsers import FType
 from helpers import *
+from segments import Segments, view
 
 
 LOOKUP = [
@@ -70,13 +74,38 @@ LOOKUP = [
 	0xafb010b1, 0xab710d06, 0xa6322bdf, 0xa2f33668,
 	0xbcb4666d, 0xb8757bda, 0xb5365d03, 0xb1f740b4]
 
-def crc32ogg(d):
+def crc32ogg_table(d):
+	"""reference CRC-32/Ogg, byte per byte"""
 	val = 0
 	for s in d:
 		val = ((val << 8) ^ LOOKUP[s ^ (val >> 24)]) & 0xffffffff
 	return val
 
 
+# CRC-32/Ogg (polynomial 0x04c11db7, not reflected, no inversion) computed by binascii:
+# the CRC is the bit reversal of the reflected CRC-32 of the bit-reversed bytes.
+
+REVERSED = bytes(int("{:08b}".format(i)[::-1], 2) for i in range(256))
+
+def reverse32(v):
+	return int("{:032b}".format(v)[::-1], 2)
+
+
+def crc32ogg(d, crc=0):
+	"""returns the CRC-32/Ogg of bytes or Segments d, continuing crc - the CRC of the data before d"""
+	val = reverse32(crc) ^ 0xffffffff
+	for part in (d.parts if isinstance(d, Segments) else [d]):
+		val = binascii.crc32(bytes(view(part)).translate(REVERSED), val)
+	return reverse32(val ^ 0xffffffff)
+
+
+_rng = random.Random(0)
+for _page in [b"", b"OggS", _rng.randbytes(255), _rng.randbytes(0x1c + 0xff * 2)]:
+	assert crc32ogg(_page) == crc32ogg_table(_page)
+	assert crc32ogg(_page[7:], crc32ogg(_page[:7])) == crc32ogg_table(_page)
+	assert crc32ogg(Segments([_page[:3], _page[3:]])) == crc32ogg_table(_page)
+
+
 class parser(FType):
 	DESC = "Ogg [container]"
 	TYPE = "OGG"
@@ -90,7 +119,8 @@ class parser(FType):
 
 		self.bParasite = True
 		self.parasite_o = 0x1C
-		self.parasite_s = 0xFFFF # up to FF segments of FF length
+		# a single page: up to FF segments, the last one shorter than FF to end the packet
+		self.parasite_s = 0xFE * 0xFF + 0xFE
 
 		self.cut = 0 # it also works at the top of the file
 		self.prewrap = 0x1c
@@ -105,9 +135,7 @@ class parser(FType):
 
 
 	def getPrewrap(self, parasite_s):
-		parasite__ = b"\0" * parasite_s
-		wrapped = self.wrap(parasite__)
-		delta = len(wrapped) - parasite_s
+		delta = self.wrapLen(parasite_s) - parasite_s
 
 		self.prewrap = delta
 		return delta
@@ -115,7 +143,10 @@ class parser(FType):
 
 	def wrap(self, data, id=b"junk"):
 		data_s = len(data)
-		segcount = 1 + data_s // 256
+		# lacing: full segments of FF bytes, then the rest - possibly empty - ending the packet
+		segcount = 1 + data_s // 255
+		if segcount > 255:
+			return None
 		header = b"".join([
 			b"OggS",   # Magic
 			b"\0",     # Version
@@ -127,12 +158,14 @@ class parser(FType):
 			# Segment count
 			bytes([segcount]),
 			# Segment Table
-			bytes([0xff] * (segcount - 1) + [data_s % 256]),
+			bytes([0xff] * (segcount - 1) + [data_s % 255]),
 			])
 
-		# CRC computation with null placeholder, page included
-		wrapped = header + data
-		crc = crc32ogg(wrapped)
-		wrapped = wrapped[:0x16] + int4l(crc) + wrapped[0x16+4:]
+		# CRC computation with null placeholder, page included - the data is not copied
+		crc = crc32ogg(data, crc32ogg(header))
+		return Segments([header[:0x16] + int4l(crc) + header[0x16+4:], data])
+
 
-		return wrapped
+	def wrapLen(self, data_s):
+		segcount = 1 + data_s // 255
+		return 27 + segcount + data_s
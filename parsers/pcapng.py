@@ -29,6 +29,10 @@ class parser(FType):
 		return parasite
 
 
+	def fixparasiteLen(self, parasite_s):
+		return parasite_s + -parasite_s % 4
+
+
 	def wrap(self, parasite):
 		l = int4l(len(parasite) + 4*4)
 
@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 
-import fitz # PyMuPDF
 import os
 import re
 from parsers import FType
@@ -171,7 +170,20 @@ class parser(FType):
 		return contents
 
 
+	def fixformatLen(self, size, delta):
+		# the startxref offset can get longer
+		startXREF = self.data.find(b"\nxref\n0 ") + 1
+		startStartXref = self.data.find(b"\nstartxref\n", startXREF) + len(b"\nstartxref\n")
+		endStartXref = self.data.find(b"\n%%EOF", startStartXref)
+		return size - 1 + len(b"%i" % (startXREF + delta)) - (endStartXref - startStartXref)
+
+
 	def normalize(self):
+		# PyMuPDF: slow to import, only when a PDF is hosting
+		try:
+			import pymupdf as fitz
+		except ImportError: # before 1.24.3
+			import fitz
 		_DEBUG_FILES = 0
 
 		# Merging with a dummy page
@@ -181,7 +193,7 @@ class parser(FType):
 				blankdoc._newPage()
 				mergedDoc.insert_pdf(blankdoc)
 
-			with fitz.open(stream=self.data, filetype="pdf") as inDoc:
+			with fitz.open(stream=bytes(self.data), filetype="pdf") as inDoc:
 				metadata = inDoc.metadata
 				if _DEBUG_FILES: inDoc.save("_0normalized.pdf")
 
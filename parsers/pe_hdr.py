@@ -30,6 +30,10 @@ class parser(FType):
 		return parasite
 
 
+	def fixparasiteLen(self, parasite_s):
+		return parasite_s + -parasite_s % 4
+
+
 	def parasitize(self, fparasite):
 		# strategy: add parasite between DOS and PE headers
 
@@ -34,10 +34,11 @@ def getPEhdr(d):
 
 
 def relocateSections(d, SecTblOff, SecCount, delta):
+	relocs = Relocations()
 	for i in range(SecCount):
 		offset = SecTblOff + i*0x28 + 0x14
-		d = inc4l(d, offset, delta)
-	return d
+		relocs.inc4l(offset, delta)
+	return relocs.apply(d)
 
 
 class parser(FType):
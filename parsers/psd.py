@@ -52,6 +52,10 @@ class parser(FType):
 		return parasite
 
 
+	def fixparasiteLen(self, parasite_s):
+		return parasite_s + parasite_s % 2
+
+
 	def wrap(self, parasite):
 		ImageResourceBlock = b"".join([
 			b"8BIM",       # Signature
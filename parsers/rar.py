@@ -8,6 +8,7 @@ class parser(FType):
 	MAGIC14 = b"RE~^\7\0"
 	MAGIC4 = b"Rar!\x1A\7\0"
 	MAGIC5 = b"Rar!\x1A\7\1\0"
+	MAGICS = [MAGIC4, MAGIC5]
 
 	def __init__(self, data=""):
 		FType.__init__(self, data)
@@ -9,7 +9,9 @@ class parser(FType):
 	TYPE = "RIFF"
 	MAGICl = b"RIFF"
 	MAGICb = b"RIFX"
+	MAGICS = [MAGICl, MAGICb]
 	WEBPTYPE = b"WEBP"
+	HEADER_s = 8 # magic, size
 
 	def __init__(self, data=""):
 		FType.__init__(self, data)
@@ -55,6 +57,10 @@ class parser(FType):
 		return parasite
 
 
-	def fixformat(self, d, delta):
-		d = d[:4] + int4(len(d) - 8, self.endianness) + d[8:]
-		return d
+	def fixparasiteLen(self, parasite_s):
+		return parasite_s + parasite_s % 2
+
+
+	def fixheader(self, head, size, delta):
+		head[4:8] = int4(size - 8, self.endianness)
+		return head
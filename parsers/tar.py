@@ -93,6 +93,10 @@ class parser(FType):
 		return parasite
 
 
+	def fixparasiteLen(self, parasite_s):
+		return parasite_s + -parasite_s % 512
+
+
 	def emptyHdr(self):
 		l = 512 * [0]
 		off = 0x64
@@ -30,6 +30,7 @@ class parser(FType):
 	TYPE = "TIFF"
 	MAGICb = b"MM\0\x2a"
 	MAGICl = b"II\x2a\0"
+	MAGICS = [MAGICb, MAGICl]
 
 	# pointer to the first IFD
 	ifdptr_o = 4
@@ -71,11 +72,16 @@ class parser(FType):
 		return parasite
 
 
+	def fixparasiteLen(self, parasite_s):
+		return parasite_s + parasite_s % 2
+
+
 	def fixformat(self, d, delta):
+		relocs = Relocations()
 		o = self.ifdptr_o
 		while o != 0:
-			d = inc4(d, o, delta, self.endianness)
-			o = get4(d, o, self.endianness)
+			relocs.inc4(o, delta, self.endianness)
+			o = get4(d, o, self.endianness) + delta
 
 			c = get2(d, o, self.endianness) # entries count
 			o += 2
@@ -92,7 +98,7 @@ class parser(FType):
 				if tag == 273: # StripOffsets
 					# print(tag, type_, count, valoff)
 					if type_ == LONG and count == 1:
-						d = inc4(d, o, delta, self.endianness)
+						relocs.inc4(o, delta, self.endianness)
 					else: 
 						raise Exception("TIFF", "TODO: handle more cases")
 
@@ -100,4 +106,4 @@ class parser(FType):
 
 			o = get4(d, o, self.endianness)
 
-		return d
+		return relocs.apply(d)
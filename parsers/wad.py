@@ -9,6 +9,7 @@ class parser(FType):
 	TYPE = "WAD"
 	MAGICi = b"IWAD"
 	MAGICp = b"PWAD"
+	MAGICS = [MAGICi, MAGICp]
 
 	sig_o = 0
 	sig_s = 4
@@ -44,12 +45,13 @@ class parser(FType):
 
 	def fixformat(self, d, delta):
 		"Increase the pointers if the size is not null (non-virtual)."
-		d = inc4l(d, self.infotableofs_o, delta)
+		relocs = Relocations()
+		relocs.inc4l(self.infotableofs_o, delta)
 		ptr = self.lumps_o + delta
 		for i in range(self.numlumps):
 			size = get4l(d, ptr + 4)
 			if size != 0:
-				d = inc4l(d, ptr, delta)
+				relocs.inc4l(ptr, delta)
 			ptr += 0x10
 
-		return d
+		return relocs.apply(d)
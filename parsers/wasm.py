@@ -40,9 +40,7 @@ class parser(FType):
 
 
 	def getPrewrap(self, parasite_s):
-		parasite__ = b"\0" * parasite_s
-		wrapped = self.wrap(parasite__)
-		delta = len(wrapped) - parasite_s
+		delta = self.wrapLen(parasite_s) - parasite_s
 		assert delta >= self.prewrap
 
 		self.prewrap = delta
@@ -54,5 +52,12 @@ class parser(FType):
 		wrapped = b"\0" + toLEB128(len(wrapped)) + wrapped
 		return wrapped
 
+	def wrapLen(self, parasite_s, name=b""):
+		wrapped_s = 2 + len(name) + parasite_s
+		return 1 + len(toLEB128(wrapped_s)) + wrapped_s
+
 	def wrappend(self, data):
 		return self.wrap(data)
+
+	def wrappendLen(self, data_s):
+		return self.wrapLen(data_s)
@@ -1,9 +1,126 @@
 #!/usr/bin/env python3
 
-import io
-import zipfile
 import os
+import struct
+import binascii
 from parsers import FType
+from segments import Segments, view
+
+
+LFH = b"PK\3\4"
+CDH = b"PK\1\2"
+EOCD = b"PK\5\6"
+EOCD64 = b"PK\6\6"
+LOCATOR64 = b"PK\6\7"
+
+# 1981/02/03 04:05:06 - invariant for easier testing
+DOSTIME = (4 << 11) | (5 << 5) | (6 // 2)
+DOSDATE = ((1981 - 1980) << 9) | (2 << 5) | 3
+
+
+def crc32(d):
+	crc = 0
+	for part in (d.parts if isinstance(d, Segments) else [d]):
+		crc = binascii.crc32(view(part), crc)
+	return crc
+
+
+def relocateEntry(cd, o, delta):
+	"""shifts by delta the local header offset of the central directory entry at o, returns its length or None"""
+	if o + 46 > len(cd) or cd[o:o+4] != CDH:
+		return None
+	csize, usize, namelen, extralen, commentlen = struct.unpack_from("<IIHHH", cd, o + 20)
+	offset, = struct.unpack_from("<I", cd, o + 42)
+	length = 46 + namelen + extralen + commentlen
+	if o + length > len(cd):
+		return None # truncated entry
+	if offset != 0xFFFFFFFF:
+		if offset + delta >= 0xFFFFFFFF:
+			return None # would need a Zip64 extra field
+		struct.pack_into("<I", cd, o + 42, offset + delta)
+		return length
+
+	# Zip64 extra field: the 64-bit values of the saturated fields, in order
+	e = o + 46 + namelen
+	while e + 4 <= o + 46 + namelen + extralen:
+		id, size = struct.unpack_from("<HH", cd, e)
+		if id == 1:
+			field = e + 4 + 8 * ((usize == 0xFFFFFFFF) + (csize == 0xFFFFFFFF))
+			if field + 8 > min(e + 4 + size, o + 46 + namelen + extralen):
+				return None
+			offset, = struct.unpack_from("<Q", cd, field)
+			struct.pack_into("<Q", cd, field, offset + delta)
+			return length
+		e += 4 + size
+	return None
+
+
+def findEnd(data):
+	"""returns the offset of the end of central directory record, or None.
+
+	The comment may contain the signature: only a record whose comment ends the data is kept."""
+	end = len(data)
+	while True:
+		eocd_o = data.rfind(EOCD, max(0, len(data) - 22 - 0xFFFF), end)
+		if eocd_o < 0:
+			return None
+		if eocd_o + 22 <= len(data):
+			commentlen, = struct.unpack_from("<H", data, eocd_o + 20)
+			if eocd_o + 22 + commentlen == len(data):
+				return eocd_o
+		end = eocd_o + 3 # previous match
+
+
+def relocate(data, delta, entries=b"", count=0):
+	"""returns where the central directory of a Zip starts, and the records from there -
+	central directory with count entries prepended, then end records - with all offsets shifted by delta.
+
+	Returns None if the records are not found or can't be shifted."""
+	eocd_o = findEnd(data)
+	if eocd_o is None:
+		return None
+	total, cd_s, cd_o = struct.unpack_from("<HII", data, eocd_o + 10)
+
+	eocd64_o = None
+	if eocd_o >= 20 and data[eocd_o-20:eocd_o-16] == LOCATOR64:
+		eocd64_o, = struct.unpack_from("<Q", data, eocd_o - 20 + 8)
+		if eocd64_o + 56 > eocd_o - 20 or data[eocd64_o:eocd64_o+4] != EOCD64:
+			return None
+		total, cd_s, cd_o = struct.unpack_from("<QQQ", data, eocd64_o + 32)
+	if cd_o + cd_s > eocd_o or (eocd64_o is not None and cd_o + cd_s > eocd64_o):
+		return None
+
+	cd = bytearray(data[cd_o:cd_o + cd_s])
+	o = 0
+	for _ in range(total):
+		length = relocateEntry(cd, o, delta)
+		if length is None:
+			return None
+		o += length
+
+	end = bytearray(data[cd_o + cd_s:])
+	shift = delta + len(entries) # of the records after the central directory
+	if eocd64_o is not None:
+		r = eocd64_o - (cd_o + cd_s)
+		total, cd_s64, cd_o64 = struct.unpack_from("<QQQ", end, r + 32)
+		struct.pack_into("<QQQQ", end, r + 24, total + count, total + count, cd_s64 + len(entries), cd_o64 + delta)
+		struct.pack_into("<Q", end, eocd_o - 20 + 8 - (cd_o + cd_s), eocd64_o + shift)
+
+	r = eocd_o - (cd_o + cd_s)
+	total, cd_s32, cd_o32 = struct.unpack_from("<HII", end, r + 10)
+	if total != 0xFFFF:
+		if total + count >= 0xFFFF:
+			return None
+		struct.pack_into("<HH", end, r + 8, total + count, total + count)
+	if cd_s32 != 0xFFFFFFFF:
+		struct.pack_into("<I", end, r + 12, cd_s32 + len(entries))
+	if cd_o32 != 0xFFFFFFFF:
+		if cd_o32 + delta >= 0xFFFFFFFF:
+			return None
+		struct.pack_into("<I", end, r + 16, cd_o32 + delta)
+
+	return cd_o, bytes(entries) + cd + end
+
 
 class parser(FType):
 	DESC = "Zip"
@@ -29,25 +146,41 @@ class parser(FType):
 		return self.data.startswith(self.MAGIC) # totally incomplete
 
 
-	def parasitize(self, fparasite):
-		# TODO: with no recompression
+	def fixformat(self, data, delta=0):
+		"""shifts the offsets of the central directory and of the end records by delta.
 
-		# strategy: just store the parasite as first invisible file with no compression
-		zipinfo = zipfile.ZipInfo(
-			filename='', # it works - sometimes hidden by software
-			date_time=(1981, 2, 3, 4, 5, 6) # invariant for easier testing
-		) 
+		Only these records are read and rewritten: the members are kept as they are, as Segments of data."""
+		try:
+			relocated = relocate(data, delta)
+		except (struct.error, ValueError):
+			relocated = None # never fails the layout
+		if relocated is None:
+			return data # left to the readers tolerating shifted offsets
+		cd_o, records = relocated
+		return Segments([Segments([data]).cut(0, cd_o), records])
 
-		hHost = io.BytesIO(self.data)
-		hFinal = io.BytesIO()
 
-		with zipfile.ZipFile(hFinal, 'w', zipfile.ZIP_STORED) as final:
-			final.writestr(zipinfo, fparasite.data)
+	def relocate(self, data, offset):
+		return self.fixformat(data, offset)
+
+
+	def parasitize(self, fparasite):
+		# strategy: just store the parasite as first invisible file with no compression,
+		# then copy the host members as they are - only the central directory is relocated
+		parasite = fparasite.data
+		crc, size = crc32(parasite), len(parasite)
+		# stored, with an empty file name: it works - sometimes hidden by software
+		header = struct.pack("<4sHHHHHIIIHH",
+			LFH, 20, 0, 0, DOSTIME, DOSDATE, crc, size, size, 0, 0)
+		# made on Unix, at offset 0
+		entry = struct.pack("<4sHHHHHHIIIHHHHHII",
+			CDH, 0x314, 20, 0, 0, DOSTIME, DOSDATE, crc, size, size, 0, 0, 0, 0, 0, 0o600 << 16, 0)
 
-			with zipfile.ZipFile(hHost, "r") as zf:
-				for n in zf.namelist():
-						contents = zf.open(n).read()
-						final.writestr(zf.getinfo(n), contents, compress_type=zipfile.ZIP_DEFLATED)
+		relocated = relocate(self.data, len(header) + size, entry, 1)
+		if relocated is None:
+			return None, []
+		cd_o, records = relocated
 
-		swaps = [0x1e, 0x1e + len(fparasite.data)]
-		return hFinal.getvalue(), swaps
+		host = Segments([self.data])
+		swaps = [0x1e, 0x1e + size]
+		return Segments([header, parasite, host.cut(0, cd_o), records]), swaps
@@ -0,0 +1,145 @@
+import json
+import time
+import functools
+import tracemalloc
+
+
+# Per-stage profiling of a generation:
+# each stage is timed, with the memory it allocated (peak, traced by tracemalloc),
+# within the layout and for the parser it belongs to.
+
+# parser methods profiled as stages
+METHODS = [
+	"normalize", "getCut", "fixparasite", "wrap", "wrappend",
+	"fixformat", "fixheader", "parasitize", "zipper",
+]
+
+
+class Frame(object):
+	def __init__(self, name, cat, args, start, mem):
+		self.name = name
+		self.cat = cat
+		self.args = args
+		self.start = start
+		self.mem = mem  # traced memory when entered
+		self.peak = mem # highest traced memory seen so far
+
+
+class Profiler(object):
+	def __init__(self):
+		self.events = [] # (name, cat, args, start, duration, allocated)
+		self.stack = []
+		self.origin = time.perf_counter_ns()
+		self.tracing = not tracemalloc.is_tracing() # started here: stopped by stop
+		if self.tracing:
+			tracemalloc.start()
+
+
+	def stop(self):
+		"""stops tracing allocations, if this profiler started it"""
+		if self.tracing:
+			tracemalloc.stop()
+			self.tracing = False
+
+
+	def enter(self, name, cat, args):
+		mem, peak = tracemalloc.get_traced_memory()
+		if self.stack:
+			self.stack[-1].peak = max(self.stack[-1].peak, peak)
+		tracemalloc.reset_peak()
+		for frame in self.stack:
+			# inherit the layout and parser of the enclosing stages
+			args = dict(frame.args, **args)
+		self.stack.append(Frame(name, cat, args, time.perf_counter_ns(), mem))
+
+
+	def exit(self):
+		end = time.perf_counter_ns()
+		frame = self.stack.pop()
+		mem, peak = tracemalloc.get_traced_memory()
+		frame.peak = max(frame.peak, peak)
+		if self.stack:
+			self.stack[-1].peak = max(self.stack[-1].peak, frame.peak)
+		tracemalloc.reset_peak()
+		self.events.append((frame.name, frame.cat, frame.args,
+			frame.start - self.origin, end - frame.start, frame.peak - frame.mem))
+
+
+	def stage(self, name, cat="stage", **args):
+		return Stage(self, name, cat, args)
+
+
+	def summary(self):
+		"""returns the total time and allocations of each stage, per layout and per parser"""
+		totals = {}
+		for name, cat, args, start, duration, allocated in self.events:
+			key = (args.get("layout"), args.get("parser"), name)
+			total = totals.setdefault(key, {
+				"layout": key[0],
+				"parser": key[1],
+				"stage": name,
+				"calls": 0,
+				"time_ms": 0,
+				"allocated": 0,
+			})
+			total["calls"] += 1
+			total["time_ms"] += duration / 1e6
+			total["allocated"] += allocated
+		return sorted(totals.values(), key=lambda t: -t["time_ms"])
+
+
+	def trace(self):
+		"""returns the events in Chrome trace-event format"""
+		return {"traceEvents": [{
+			"name": name,
+			"cat": cat,
+			"ph": "X",
+			"ts": start / 1e3,
+			"dur": duration / 1e3,
+			"pid": 0,
+			"tid": 0,
+			"args": dict(args, allocated=allocated),
+		} for name, cat, args, start, duration, allocated in self.events]}
+
+
+	def save(self, prefix):
+		"""writes <prefix>.json (summary) and <prefix>.trace.json (trace events)"""
+		with open(prefix + ".json", "w") as f:
+			json.dump(self.summary(), f, indent=1)
+		with open(prefix + ".trace.json", "w") as f:
+			json.dump(self.trace(), f)
+
+
+class Stage(object):
+	def __init__(self, profiler, name, cat, args):
+		self.profiler = profiler
+		self.name = name
+		self.cat = cat
+		self.args = args
+
+	def __enter__(self):
+		self.profiler.enter(self.name, self.cat, self.args)
+
+	def __exit__(self, *exc):
+		self.profiler.exit()
+
+
+def wrap(profiler, ftype, name, method):
+	@functools.wraps(method)
+	def profiled(*args, **kwargs):
+		with profiler.stage(name, "parser", parser=ftype.TYPE):
+			return method(*args, **kwargs)
+	return profiled
+
+
+def attach(session, *ftypes):
+	"""makes the methods of the ftypes profiled stages, if the session is profiled"""
+	if session.profiler is None:
+		return
+	for ftype in ftypes:
+		if ftype is None or "_profiled" in vars(ftype):
+			continue
+		for name in METHODS:
+			if hasattr(ftype, name):
+				setattr(ftype, name, wrap(session.profiler, ftype, name, getattr(ftype, name)))
+		ftype._profiled = True
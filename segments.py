@@ -0,0 +1,235 @@
+import os
+import mmap
+import hashlib
+
+
+IOV_MAX = os.sysconf("SC_IOV_MAX") if hasattr(os, "sysconf") else 1024
+
+
+class Mapped(mmap.mmap):
+	"""a read-only file mapping, usable as host data.
+
+	Adds the bytes methods parsers rely on; ranges of it put in Segments
+	are copied from file to file by the kernel when written."""
+
+	fd = None # duplicate of the file descriptor, the source of kernel copies - closed with the mapping
+
+	def close(self):
+		self.closefd()
+		mmap.mmap.close(self)
+
+	def __del__(self):
+		self.closefd()
+
+	def closefd(self):
+		if self.fd is not None:
+			os.close(self.fd)
+			self.fd = None
+
+	def startswith(self, prefix, start=0, end=None):
+		if isinstance(prefix, tuple):
+			return any(self.startswith(p, start, end) for p in prefix)
+		end = len(self) if end is None else min(end, len(self))
+		return end - start >= len(prefix) and self[start:start + len(prefix)] == prefix
+
+	def endswith(self, suffix, start=0, end=None):
+		if isinstance(suffix, tuple):
+			return any(self.endswith(s, start, end) for s in suffix)
+		end = len(self) if end is None else min(end, len(self))
+		return end - start >= len(suffix) and self[end - len(suffix):end] == suffix
+
+	def count(self, sub, start=0, end=None):
+		n = 0
+		start = self.find(sub, start, *([] if end is None else [end]))
+		while start != -1:
+			n += 1
+			start = self.find(sub, start + max(1, len(sub)), *([] if end is None else [end]))
+		return n
+
+	def __add__(self, other):
+		return bytes(self) + bytes(other)
+
+	def __radd__(self, other):
+		return bytes(other) + bytes(self)
+
+
+def load(fn, bMap=False):
+	"""returns the content of a file, mapped in memory if bMap (and not empty)"""
+	with open(fn, "rb") as f:
+		if bMap and os.fstat(f.fileno()).st_size > 0:
+			data = Mapped(f.fileno(), 0, access=mmap.ACCESS_READ)
+			data.fd = os.dup(f.fileno())
+			return data
+		return f.read()
+
+
+class FileRange(object):
+	"""a range of a mapped file"""
+
+	def __init__(self, src, offset, length):
+		self.src = src
+		self.offset = offset
+		self.length = length
+
+	def __len__(self):
+		return self.length
+
+	def __getitem__(self, key):
+		start, stop, step = key.indices(self.length)
+		assert step == 1
+		return FileRange(self.src, self.offset + start, max(0, stop - start))
+
+	def view(self):
+		return memoryview(self.src)[self.offset:self.offset + self.length]
+
+	def copy(self, fd):
+		"""copies the range at the current position of fd, in the kernel if possible"""
+		offset, count = self.offset, self.length
+		while count > 0:
+			n = 0
+			for copy in [copy_file_range, sendfile]:
+				n = copy(self.src.fd, fd, offset, count)
+				if n:
+					break
+			else:
+				n = os.write(fd, memoryview(self.src)[offset:offset + count])
+			offset += n
+			count -= n
+
+
+def copy_file_range(fdin, fdout, offset, count):
+	if not hasattr(os, "copy_file_range"):
+		return 0
+	try:
+		return os.copy_file_range(fdin, fdout, count, offset)
+	except OSError: # cross-filesystem on old kernels, unsupported filesystem...
+		return 0
+
+
+def sendfile(fdin, fdout, offset, count):
+	if not hasattr(os, "sendfile"):
+		return 0
+	try:
+		return os.sendfile(fdout, fdin, offset, count)
+	except OSError:
+		return 0
+
+
+def view(part):
+	"""returns the buffer of a part of Segments"""
+	return part.view() if isinstance(part, FileRange) else part
+
+
+class Segments(object):
+	"""data made of slices of existing buffers, assembled without copying them.
+
+	Only the slices are kept: hashing and writing are done slice by slice.
+	Slicing or converting to bytes makes an actual copy.
+	Ranges of Mapped files are kept as FileRange."""
+
+	def __init__(self, parts=[]):
+		self.parts = []
+		for part in parts:
+			self.append(part)
+
+
+	def append(self, part):
+		if isinstance(part, Segments):
+			self.parts += part.parts
+		elif len(part) == 0:
+			return
+		elif isinstance(part, Mapped):
+			self.parts.append(FileRange(part, 0, len(part)))
+		elif isinstance(part, FileRange):
+			self.parts.append(part)
+		else:
+			self.parts.append(memoryview(part).cast("B"))
+
+
+	def __len__(self):
+		return sum(len(part) for part in self.parts)
+
+
+	def __add__(self, other):
+		return Segments([self, other])
+
+
+	def __radd__(self, other):
+		return Segments([other, self])
+
+
+	def __bytes__(self):
+		return b"".join(map(view, self.parts))
+
+
+	def __getitem__(self, key):
+		if isinstance(key, int):
+			return self[key:key + 1 or None][0]
+		start, stop, step = key.indices(len(self))
+		assert step == 1
+		return b"".join(map(view, self.slices(start, stop)))
+
+
+	def cut(self, start, stop=None):
+		"""returns the [start:stop] range as Segments, without copying"""
+		stop = len(self) if stop is None else stop
+		return Segments(self.slices(start, stop))
+
+
+	def slices(self, start, stop):
+		"""yields the parts of the [start:stop] range"""
+		offset = 0
+		for part in self.parts:
+			end = offset + len(part)
+			if end > start and offset < stop:
+				yield part[max(0, start - offset):min(len(part), stop - offset)]
+			offset = end
+
+
+def sha256(data):
+	"""hashes bytes or Segments"""
+	h = hashlib.sha256()
+	for part in (data.parts if isinstance(data, Segments) else [data]):
+		h.update(view(part))
+	return h
+
+
+def write(f, data):
+	"""writes bytes or Segments to a file.
+
+	Buffers are written with vectored I/O if available,
+	FileRanges are copied by the kernel if possible."""
+	if not isinstance(data, Segments):
+		f.write(data)
+		return
+
+	f.flush()
+	fd = f.fileno()
+	buffers = []
+	for part in data.parts:
+		if isinstance(part, FileRange):
+			writev(fd, buffers)
+			buffers = []
+			part.copy(fd)
+		else:
+			buffers.append(part)
+	writev(fd, buffers)
+
+
+def writev(fd, parts):
+	"""writes buffers to fd, with vectored I/O if available"""
+	parts = list(parts)
+	i = 0
+	while i < len(parts):
+		if hasattr(os, "writev"):
+			written = os.writev(fd, parts[i:i + IOV_MAX])
+		else:
+			written = os.write(fd, parts[i])
+		# partial writes: skip what's written, keep the rest of the last slice
+		while written > 0:
+			if written >= len(parts[i]):
+				written -= len(parts[i])
+				i += 1
+			else:
+				parts[i] = parts[i][written:]
+				written = 0
@@ -0,0 +1,105 @@
+import io
+import os
+import stat
+import json
+import base64
+import contextlib
+import socketserver
+
+import args
+import cache
+import mitra
+
+
+# Resident server, running the jobs sent to a UNIX socket with warm imports and caches:
+# parser modules stay imported, identified files and normalized hosts stay in memory.
+#
+# A job is a JSON line:
+#  {"argv": [arguments of mitra.py], "cwd": directory of the relative paths,
+#   "data1", "data2": base64 contents of file1 and file2, instead of reading them}
+# The reply is a JSON line:
+#  {"records": [outputs: polyglots, plans or matrix lines], "output": printed text}
+# with "error" instead of "records" if the job failed.
+#
+# Jobs run one at a time: their printed text is captured from stdout.
+
+# arguments holding paths, relative to the directory of the client
+PATHS = ["file1", "file2", "outdir", "splitdir", "matrix", "cache", "store", "archive", "profile"]
+
+
+def resolve(parsed, cwd):
+	"""makes the paths of the parsed arguments relative to cwd, outputs included"""
+	for name in PATHS:
+		value = getattr(parsed, name)
+		if value:
+			setattr(parsed, name, os.path.join(cwd, value))
+	parsed.outdir = parsed.outdir or cwd
+	parsed.splitdir = parsed.splitdir or cwd
+
+
+def decode(job, key):
+	return base64.b64decode(job[key]) if job.get(key) is not None else None
+
+
+def run(job, memo):
+	"""runs a job, returns its records"""
+	parsed = args.parseArgs(mitra.__description__, argv=job["argv"])
+	if parsed.serve is not None:
+		raise ValueError("a job can't start a server")
+	resolve(parsed, job.get("cwd") or os.getcwd())
+
+	session = args.Session(args.configure(parsed))
+	session.memo = memo
+	if parsed.archive:
+		import archive # tarfile and zipfile: only imported if needed
+		session.sink = archive.create(parsed.archive)
+	try:
+		return mitra.run(parsed, session, decode(job, "data1"), decode(job, "data2"))
+	finally:
+		if session.sink is not None:
+			session.sink.close()
+
+
+class Handler(socketserver.StreamRequestHandler):
+	def handle(self):
+		out = io.StringIO()
+		try:
+			job = json.loads(self.rfile.readline())
+			with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+				reply = {"records": run(job, self.server.memo)}
+		except SystemExit as e: # usage or version: in the output
+			reply = {"error": "invalid arguments"} if e.code else {"records": []}
+		except Exception as e:
+			reply = {"error": "%s: %s" % (type(e).__name__, e)}
+		reply["output"] = out.getvalue()
+		self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+def removeSocket(path):
+	"""removes the UNIX socket path if it exists - fails on any other file"""
+	try:
+		mode = os.lstat(path).st_mode
+	except FileNotFoundError:
+		return
+	if not stat.S_ISSOCK(mode):
+		raise FileExistsError("%s exists and is not a socket" % path)
+	os.remove(path)
+
+
+class Server(socketserver.UnixStreamServer):
+	def __init__(self, path):
+		removeSocket(path) # left by a previous server
+		socketserver.UnixStreamServer.__init__(self, path, Handler)
+		self.memo = cache.Memory()
+
+
+def serve(path):
+	"""runs the jobs sent to the UNIX socket path, until interrupted"""
+	with Server(path) as server:
+		print("Serving on %s" % path, flush=True)
+		try:
+			server.serve_forever()
+		except KeyboardInterrupt:
+			pass
+		finally:
+			removeSocket(path)
@@ -0,0 +1,61 @@
+import io
+import random
+
+
+# Split payloads: each file of a polyglot alone, with the data of the other file
+# replaced by random filler.
+#
+# The data is cut at each swap: ranges alternately belong to each payload.
+# The filler only depends on a seed and on its position, so each payload
+# can be written on its own, in bounded memory, and is reproducible.
+
+CHUNK_s = 1024 * 1024 # filler is generated per aligned chunk
+
+
+def ranges(size, swaps):
+	"""yields (start, end, owner): the ranges of the data and the index of the payload keeping them"""
+	start = 0
+	for owner, end in enumerate(list(swaps) + [size]):
+		if end > start:
+			yield start, end, owner % 2
+		start = max(start, end)
+
+
+def filler(seed, start, end):
+	"""yields the random filler of the positions start:end"""
+	for chunk in range(start // CHUNK_s, (end - 1) // CHUNK_s + 1):
+		offset = chunk * CHUNK_s
+		needed = min(end, offset + CHUNK_s) - offset
+		# only the start of the chunk: whole 32-bit words are the same in any prefix
+		block = random.Random(seed * 0x100000000 + chunk).randbytes(-(-needed // 4) * 4)
+		yield block[max(start, offset) - offset:needed]
+
+
+def payload(data, swaps, index, seed, f, start=0):
+	"""writes payload index (0 or 1) of data from position start to the file f"""
+	for begin, end, owner in ranges(len(data), swaps):
+		begin = max(begin, start)
+		if begin >= end:
+			continue
+		if owner != index:
+			for block in filler(seed, begin, end):
+				f.write(block)
+			continue
+		for offset in range(begin, end, CHUNK_s):
+			f.write(data[offset:min(end, offset + CHUNK_s)])
+
+
+def split(data, swaps, seed):
+	"""returns both payloads of data: the one keeping its start, then the other one"""
+	payloads = []
+	for index in range(2):
+		f = io.BytesIO()
+		payload(data, swaps, index, seed, f)
+		payloads.append(f.getvalue())
+	return payloads
+
+
+assert list(ranges(10, [2, 5])) == [(0, 2, 0), (2, 5, 1), (5, 10, 0)]
+assert b"".join(filler(1, 3, 6)) + b"".join(filler(1, 6, 9)) == b"".join(filler(1, 0, 12))[3:9]
+_p0, _p1 = split(b"0123456789", [2, 5], 0)
+assert _p0[:2] + _p0[5:] == b"0156789" and _p1[2:5] == b"234" and len(_p1) == 10
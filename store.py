@@ -0,0 +1,121 @@
+import os
+import hashlib
+import itertools
+import threading
+import contextlib
+
+import segments
+
+
+# Content-addressed store of the outputs.
+#
+# Each content is written once, as <dir>/<2 first hex digits>/<rest of the sha256>.
+# Output names are hardlinks to it, and are recorded in <dir>/index
+# as "<sha256>  <name>" lines - the only record if the name can't be linked
+# (different filesystem...).
+
+TMP_COUNT = itertools.count()
+
+
+def tmpName(prefix):
+	"""returns a temporary file name unique to this process, thread and call"""
+	return "%s.%i.%i.%i.tmp" % (prefix, os.getpid(), threading.get_ident(), next(TMP_COUNT))
+
+
+class Store(object):
+	def __init__(self, dir):
+		self.dir = dir
+		os.makedirs(dir, exist_ok=True)
+
+
+	def path(self, digest):
+		return os.path.join(self.dir, digest[:2], digest[2:])
+
+
+	def put(self, data, digest=None):
+		"""writes data unless already stored, returns its path"""
+		if digest is None:
+			digest = segments.sha256(data).hexdigest()
+		path = self.path(digest)
+		if os.path.exists(path):
+			return path
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		tmp = tmpName(path)
+		with open(tmp, "wb") as f:
+			segments.write(f, data)
+		os.replace(tmp, path)
+		return path
+
+
+	def link(self, path, name):
+		"""makes name a hardlink to the stored path, returns False if it can't"""
+		try:
+			os.remove(name)
+		except FileNotFoundError:
+			pass
+		try:
+			os.link(path, name)
+		except OSError:
+			return False
+		return True
+
+
+	def save(self, name, data, digest=None):
+		"""stores data once, as name"""
+		if digest is None:
+			digest = segments.sha256(data).hexdigest()
+		self.record(self.put(data, digest), digest, name)
+
+
+	@contextlib.contextmanager
+	def open(self, name):
+		"""context of a file to write, stored once closed"""
+		tmp = tmpName(os.path.join(self.dir, "open"))
+		with open(tmp, "wb") as f:
+			hashed = Hashed(f)
+			yield hashed
+		digest = hashed.hash.hexdigest()
+		path = self.path(digest)
+		if os.path.exists(path):
+			os.remove(tmp)
+		else:
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+			os.replace(tmp, path)
+		self.record(path, digest, name)
+
+
+	def record(self, path, digest, name):
+		"""links name to the stored path, and indexes it"""
+		if os.path.exists(name) and os.path.samefile(path, name):
+			return # already saved
+		self.link(path, name)
+		# a single write per line: concurrent runs can share the index
+		with open(os.path.join(self.dir, "index"), "a") as f:
+			f.write("%s  %s\n" % (digest, name))
+
+
+class Hashed(object):
+	"""file hashing what is written to it"""
+	def __init__(self, f):
+		self.f = f
+		self.hash = hashlib.sha256()
+
+	def write(self, data):
+		self.hash.update(data)
+		return self.f.write(data)
+
+
+def create(session, name):
+	"""context of a file to write as name, stored in the session store if any"""
+	if not session.getVar("STORE"):
+		return open(name, "wb")
+	return Store(session.getVar("STORE")).open(name)
+
+
+def save(session, name, data, digest=None):
+	"""writes data as name, once per content in the session store if any"""
+	if not session.getVar("STORE"):
+		with open(name, "wb") as f:
+			segments.write(f, data)
+		return
+	Store(session.getVar("STORE")).save(name, data, digest)
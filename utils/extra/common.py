@@ -8,8 +8,10 @@ import random
 import re
 from string import punctuation, digits, ascii_letters
 
+import split # the split engine of Mitra: run the tools as modules from the repository
+
 def randblock(l):
-	return bytes([random.randrange(255) for i in range(l)])
+	return random.randbytes(l)
 
 
 # Cosmetic functions ###########################################################
@@ -64,24 +66,7 @@ def mixfiles(d1, d2, cuts):
 
 
 def splitfile(data, cuts):
-	p1 = b""
-	p2 = b""
-	start = 0
-	count = 0
-	for end in cuts:
-		count += 1
-		p1 += data[start:end]
-		p2 += randblock(end-start)
-
-		start = end
-		p1, p2 = p2, p1
-
-	p1 += data[end:]
-	p2 += randblock(len(data)-end)
-	assert len(p1) == len(p2)
-	if count % 2 == 1:
-		p1, p2 = p2, p1
-
+	p1, p2 = split.split(data, cuts, random.getrandbits(64))
 	return p1, p2
 
 
@@ -6,7 +6,7 @@
 
 import fitz
 
-from common import *
+from utils.extra.common import *
 import os
 import sys
 
@@ -7,7 +7,7 @@
 
 import fitz # PyMuPDF
 
-from common import *
+from utils.extra.common import *
 import os
 import sys
 